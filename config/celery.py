@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Set the default Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -13,6 +14,20 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
+
+@worker_process_init.connect
+def init_worker(**kwargs):
+    """
+    Set up Django and open the DB connection once per worker process.
+    Workers start with `celery -A config`, which loads this module;
+    config.celery_pa imports the config package too, so it gets the hook.
+    """
+    import django
+    django.setup()
+
+    from django.db import connections
+    connections['default'].ensure_connection()
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
\ No newline at end of file
@@ -18,20 +18,49 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', 'your-mysql-password'),
         'HOST': os.environ.get('DB_HOST', 'Einstein.mysql.pythonanywhere-services.com'),
         'PORT': '3306',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            'charset': 'utf8mb4',
+            'connect_timeout': 5,
+        }
     }
 }
 
-# Static files
+# Static files - served by PythonAnywhere's static files mapping (/static/ ->
+# STATIC_ROOT) so they never reach a Python worker. WhiteNoise only
+# pre-compresses them; no manifest hashing during collectstatic.
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedStaticFilesStorage'},
+}
+# Filenames aren't content-hashed, so keep the cache lifetime short
+WHITENOISE_MAX_AGE = 86400
+WHITENOISE_USE_FINDERS = False
+WHITENOISE_AUTOREFRESH = False
+WHITENOISE_SKIP_COMPRESS_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'webp', 'woff', 'woff2', 'gz', 'br', 'zip')
 
 # Email - use console backend for testing
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Redis for Celery (PythonAnywhere doesn't allow Redis on free tier)
-# We'll use database as broker for free tier
-CELERY_BROKER_URL = 'django-db'
-CELERY_RESULT_BACKEND = 'django-db'
+# Set CELERY_BROKER_URL to an external Redis instance (e.g. Redis Cloud free tier)
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'django-db')
+
+# Cache - without Redis, fall back to an in-process cache that keeps
+# rate-limit counters unpickled
+if not os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'ip_tracking.cache_backends.CounterLocMemCache',
+            'LOCATION': 'ratelimit',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
 
 # Disable geolocation APIs to avoid timeouts
 IP_TRACKING_SETTINGS = {
@@ -15,11 +15,19 @@ if os.environ.get('PYTHONANYWHERE_DOMAIN'):
             'PASSWORD': os.environ.get('DB_PASSWORD', ''),
             'HOST': os.environ.get('DB_HOST', 'Einstein.mysql.pythonanywhere-services.com'),
             'PORT': '3306',
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
             'OPTIONS': {
                 'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'charset': 'utf8mb4',
+                'connect_timeout': 5,
             }
         }
     }
+    # PythonAnywhere terminates TLS at its proxy, which sets these headers;
+    # elsewhere clients could spoof them
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+    USE_X_FORWARDED_HOST = True
 else:
     # Development database
     DATABASES = {
@@ -29,16 +37,96 @@ else:
         }
     }
 
-# Update ALLOWED_HOSTS
-ALLOWED_HOSTS = ['einstein.pythonanywhere.com', 'localhost', '127.0.0.1']
+# Cache - Redis shared by all workers so rate-limit counters stay consistent
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1')
 
-# Celery configuration for PythonAnywhere (using database as broker)
-CELERY_BROKER_URL = 'django-db'
-CELERY_RESULT_BACKEND = 'django-db'
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_POOL_KWARGS': {'max_connections': 64},
+            'IGNORE_EXCEPTIONS': True,
+            'PICKLE_VERSION': -1,
+        },
+    }
+}
+DJANGO_REDIS_CONNECTION_FACTORY = 'django_redis.pool.ConnectionFactory'
+RATELIMIT_USE_CACHE = 'default'
+
+# Optional local MaxMind GeoLite2-City database, tried before the HTTP services
+GEOIP_DB_PATH = os.environ.get('GEOIP_DB_PATH')
+
+# Update ALLOWED_HOSTS (comma-separated env vars; empty entries are dropped)
+ALLOWED_HOSTS = tuple(
+    host.strip() for host in os.environ.get(
+        'ALLOWED_HOSTS', 'einstein.pythonanywhere.com,localhost,127.0.0.1'
+    ).split(',') if host.strip()
+)
+CSRF_TRUSTED_ORIGINS = tuple(
+    origin.strip() for origin in os.environ.get('CSRF_TRUSTED_ORIGINS', '').split(',')
+    if origin.strip()
+)
+
+# Celery configuration - Redis broker (on PythonAnywhere point this at an
+# external Redis instance)
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 3600, 'polling_interval': 0.1}
+CELERY_BROKER_POOL_LIMIT = 10
+# Results in Redis so polling is cheap; tasks that need a result opt in with ignore_result=False
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL)
+CELERY_TASK_IGNORE_RESULT = True
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Hand out one task at a time so short tasks don't queue behind long anomaly sweeps
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+# Recycle worker processes to bound memory; CONN_MAX_AGE keeps DB connections alive between tasks
+CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000
+# IO-bound tasks run on a separate eventlet worker (celery -A config worker -P eventlet -c 50 -Q io)
+CELERY_TASK_ROUTES = {
+    'ip_tracking.tasks.analyze_ip_behavior': {'queue': 'io'},
+    'ip_tracking.tasks.detect_anomalies': {'queue': 'io'},
+    'ip_tracking.tasks.run_anomaly_detector': {'queue': 'io'},
+    'ip_tracking.tasks.enrich_log_geolocation': {'queue': 'io'},
+}
+
+# Single source of truth for periodic tasks; DatabaseScheduler syncs these into
+# django_celery_beat's tables on startup
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers.DatabaseScheduler'
+CELERY_BEAT_MAX_LOOP_INTERVAL = 5
+CELERY_BEAT_SCHEDULE = {
+    'detect-anomalies-daily': {
+        'task': 'ip_tracking.tasks.detect_anomalies',
+        'schedule': 86400.0,  # Daily on PythonAnywhere (hourly might be too frequent)
+    },
+    'generate-weekly-report': {
+        'task': 'ip_tracking.tasks.generate_daily_report',
+        'schedule': 604800.0,  # Weekly
+    },
+    'sync-blocked-ip-cache': {
+        'task': 'ip_tracking.tasks.sync_blocked_ip_cache',
+        'schedule': 60.0,
+    },
+    'flush-request-logs': {
+        'task': 'ip_tracking.tasks.flush_request_logs',
+        'schedule': 1.0,
+    },
+    'prune-request-logs': {
+        'task': 'ip_tracking.tasks.prune_request_logs',
+        'schedule': 3600.0,
+    },
+    'cleanup-geolocation-cache': {
+        'task': 'ip_tracking.tasks.cleanup_geolocation_cache',
+        'schedule': 86400.0,
+    },
+}
+
+# Request logs older than this are deleted by prune_request_logs
+REQUEST_LOG_RETENTION_DAYS = int(os.environ.get('REQUEST_LOG_RETENTION_DAYS', '30'))
 
 INSTALLED_APPS += [
     'django_celery_results',
@@ -47,4 +135,7 @@ INSTALLED_APPS += [
 
 # Email configuration
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-ADMIN_EMAILS = ['your-email@example.com']
\ No newline at end of file
+ADMIN_EMAILS = tuple(
+    email.strip() for email in os.environ.get('ADMIN_EMAILS', 'your-email@example.com').split(',')
+    if email.strip()
+)
\ No newline at end of file
@@ -1,33 +1,87 @@
 from django.contrib import admin
-from django.utils import timezone
+from django.contrib.admin.views.main import ChangeList
+from django.db.models import BooleanField, Case, Q, Value, When
+from django.db.models.functions import Now
 from .models import (
     RequestLog, BlockedIP, GeolocationCache, 
-    SuspiciousIP, AnomalyDetectionConfig, RateLimitLog
+    SuspiciousIP, AnomalyDetectionConfig, RateLimitLog, format_location
 )
-from django.utils.html import format_html
+from django.core.cache import cache
+from .fields import pack_ip
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
+class ChangelistOnlyMixin:
+    """
+    Restrict the changelist query to `changelist_fields`; other admin views
+    (change form, delete) still load full rows.
+    """
+    changelist_fields = None
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if (self.changelist_fields and match and match.url_name
+                and match.url_name.endswith('_changelist')):
+            queryset = queryset.only(*self.changelist_fields)
+        return queryset
+
+
+class RequestLogChangeList(ChangeList):
+    """
+    Changelist that looks up cached geolocation for rows logged without one,
+    using a single query for the whole page.
+    """
+    
+    def get_results(self, request):
+        super().get_results(request)
+        missing_ips = {log.ip_address for log in self.result_list if not log.country}
+        geolocations = GeolocationCache.objects.in_bulk(
+            missing_ips, field_name='ip_address'
+        ) if missing_ips else {}
+        for log in self.result_list:
+            geo = geolocations.get(log.ip_address)
+            if geo is not None:
+                # Fills the cached property so rendering reads it directly
+                log.location_display = format_location(geo.city, geo.region, geo.country)
+
+
 @admin.register(RequestLog)
-class RequestLogAdmin(admin.ModelAdmin):
+class RequestLogAdmin(ChangelistOnlyMixin, admin.ModelAdmin):
     list_display = ('ip_address', 'location_display', 'path', 'timestamp', 'is_suspicious')
     list_filter = ('country', 'city', 'timestamp', 'is_suspicious')
-    search_fields = ('ip_address', 'path', 'city', 'country')
+    # ip_address is stored packed and only supports exact matches; see get_search_results
+    search_fields = ('path', 'city', 'country')
     readonly_fields = ('ip_address', 'path', 'timestamp', 'get_location_display', 'anomaly_details')
     fieldsets = (
         ('Request Information', {
             'fields': ('ip_address', 'path', 'timestamp')
         }),
         ('Geolocation Information', {
-            'fields': ('country', 'city', 'region', 'latitude', 'longitude', 'timezone', 'isp')
+            'fields': ('country', 'city', 'region', 'latitude', 'longitude')
         }),
         ('Anomaly Detection', {
             'fields': ('is_suspicious', 'anomaly_reason', 'anomaly_details')
         }),
     )
-    
+    # Columns needed to render the changelist (location_display reads city/region/country)
+    changelist_fields = ('id', 'ip_address', 'path', 'timestamp', 'is_suspicious',
+                         'city', 'region', 'country')
+
+    def get_changelist(self, request, **kwargs):
+        return RequestLogChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # A search for an IP address is an exact match on the indexed column
+        try:
+            pack_ip(search_term.strip())
+        except ValueError:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(ip_address=search_term.strip()), False
+
     def location_display(self, obj):
-        return obj.get_location_display()
+        return obj.location_display
     location_display.short_description = 'Location'
     
     def anomaly_details(self, obj):
@@ -41,17 +95,30 @@ class RequestLogAdmin(admin.ModelAdmin):
 
 
 @admin.register(BlockedIP)
-class BlockedIPAdmin(admin.ModelAdmin):
-    list_display = ('ip_address', 'reason', 'created_at', 'expires_at', 'is_active')
+class BlockedIPAdmin(ChangelistOnlyMixin, admin.ModelAdmin):
+    # 'status' rather than 'is_active': the model field would win the lookup
+    # and show the flag as of the last sync instead of the live expiry check
+    list_display = ('ip_address', 'prefix_length', 'reason', 'created_at', 'expires_at', 'status')
     list_filter = ('created_at',)
     search_fields = ('ip_address', 'reason')
-    fields = ('ip_address', 'reason', 'expires_at')
-    
-    def is_active(self, obj):
-        if obj.expires_at and timezone.now() > obj.expires_at:
-            return "❌ Expired"
-        return "✅ Active"
-    is_active.short_description = 'Status'
+    fields = ('ip_address', 'prefix_length', 'reason', 'expires_at')
+    changelist_fields = ('id', 'ip_address', 'prefix_length', 'reason', 'created_at', 'expires_at')
+
+    def get_queryset(self, request):
+        # Let the database evaluate expiry once per row instead of Python
+        return super().get_queryset(request).annotate(
+            _active=Case(
+                When(Q(expires_at__isnull=True) | Q(expires_at__gt=Now()), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
+
+    def status(self, obj):
+        return obj._active
+    status.short_description = 'Status'
+    status.boolean = True
+    status.admin_order_field = '_active'
 
 
 @admin.register(SuspiciousIP)
@@ -75,20 +142,35 @@ class SuspiciousIPAdmin(admin.ModelAdmin):
     
     def details_display(self, obj):
         if obj.details:
-            details_html = "<ul>"
-            for key, value in obj.details.items():
-                details_html += f"<li><strong>{key}:</strong> {value}</li>"
-            details_html += "</ul>"
+            # last_detected changes on every save, so it versions the cached fragment
+            cache_key = f"susp:{obj.id}:{obj.last_detected.timestamp()}"
+            details_html = cache.get(cache_key)
+            if details_html is None:
+                details_html = format_html(
+                    '<ul>{}</ul>',
+                    format_html_join('', '<li><strong>{}:</strong> {}</li>', obj.details.items())
+                )
+                cache.set(cache_key, str(details_html), 3600)
             return mark_safe(details_html)
         return "No details"
     details_display.short_description = 'Detection Details'
     
+    # URL templates reversed once per process instead of once per changelist row
+    _url_templates = {}
+
+    def _action_url(self, name, object_id):
+        template = self._url_templates.get(name)
+        if template is None:
+            template = reverse(name, args=[0]).replace('/0/', '/{}/')
+            self._url_templates[name] = template
+        return template.format(object_id)
+
     def actions(self, obj):
         return format_html(
             '<a href="{}" class="button">Analyze</a> '
             '<a href="{}" class="button" style="background-color: #dc3545;">Block</a>',
-            reverse('admin:analyze_ip_action', args=[obj.id]),
-            reverse('admin:block_ip_action', args=[obj.id])
+            self._action_url('admin:analyze_ip_action', obj.id),
+            self._action_url('admin:block_ip_action', obj.id)
         )
     actions.short_description = 'Actions'
 
@@ -104,7 +186,8 @@ class AnomalyDetectionConfigAdmin(admin.ModelAdmin):
             'fields': ('name', 'description', 'enabled')
         }),
         ('Detection Rules', {
-            'fields': ('threshold', 'time_window_hours', 'sensitive_paths')
+            'fields': ('threshold', 'time_window_hours', 'short_window_minutes',
+                       'short_window_burn_rate', 'long_window_burn_rate', 'sensitive_paths')
         }),
         ('Detection Criteria', {
             'fields': ('check_frequency', 'check_sensitive_paths', 'check_error_rate')
@@ -0,0 +1,20 @@
+from django.db.models import Aggregate, CharField
+
+
+class GroupConcat(Aggregate):
+    """
+    Comma-separated concatenation of a column's values within each group:
+    GROUP_CONCAT on MySQL and SQLite, STRING_AGG on PostgreSQL.
+    """
+    function = 'GROUP_CONCAT'
+    name = 'GroupConcat'
+    allow_distinct = True
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            function='STRING_AGG',
+            template="%(function)s(%(distinct)s%(expressions)s::text, ',')",
+            **extra_context
+        )
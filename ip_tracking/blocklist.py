@@ -0,0 +1,178 @@
+import ipaddress
+import socket
+import time
+from array import array
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from .models import BlockedIP
+
+BLOCKED_IPS_CACHE_KEY = 'blocked_ips_v3'
+BLOCKED_IPS_CACHE_TIMEOUT = 120  # seconds; refreshed every 60s by sync_blocked_ip_cache
+LOCAL_SNAPSHOT_TTL = 5  # seconds a process reuses its copy before re-reading the cache
+
+# Per-process (expires_at, BlockedIPSet) copy of the shared cache entry
+_local_snapshot = None
+
+
+def _ipv4_to_int(ip):
+    """
+    Convert a dotted-quad IPv4 string to an int; raises OSError otherwise.
+    """
+    return int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+
+
+class BlockedIPSet:
+    """
+    Immutable set of blocked IPs and networks.
+
+    IPv4 blocks, single addresses or CIDR networks, are merged into sorted,
+    non-overlapping [start, end] ranges of 32-bit ints, so a lookup is one
+    binary search however many networks are blocked. The arrays pickle as
+    single buffers instead of one object per address. IPv6 addresses are
+    kept as strings and IPv6 networks as ipaddress objects.
+    """
+    __slots__ = ('starts', 'ends', 'other', 'other_networks')
+
+    def __init__(self, ip_addresses=(), networks=()):
+        ranges = []
+        other = set()
+        other_networks = []
+        for ip in ip_addresses:
+            try:
+                value = _ipv4_to_int(ip)
+            except OSError:
+                other.add(ip)
+            else:
+                ranges.append((value, value))
+        for network in networks:
+            network = ipaddress.ip_network(network, strict=False)
+            if network.version == 4:
+                ranges.append((int(network.network_address), int(network.broadcast_address)))
+            else:
+                other_networks.append(network)
+
+        starts = array('I')
+        ends = array('I')
+        for start, end in sorted(ranges):
+            if ends and start <= ends[-1] + 1:
+                # Overlapping or adjacent: extend the previous range
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts = starts
+        self.ends = ends
+        self.other = frozenset(other)
+        self.other_networks = tuple(other_networks)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """
+        Build the set from BlockedIP rows; rows with a prefix_length are
+        networks.
+        """
+        return cls.from_rows(queryset.values_list('ip_address', 'prefix_length'))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build the set from (ip_address, prefix_length) pairs, as returned by
+        from_queryset's values_list or passed in a task signature.
+        """
+        ip_addresses = []
+        networks = []
+        for ip_address, prefix_length in rows:
+            if prefix_length is None:
+                ip_addresses.append(ip_address)
+            else:
+                networks.append(f"{ip_address}/{prefix_length}")
+        return cls(ip_addresses, networks)
+
+    def __contains__(self, ip):
+        try:
+            value = _ipv4_to_int(ip)
+        except (OSError, TypeError):
+            if ip in self.other:
+                return True
+            if not self.other_networks:
+                return False
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                return False
+            return any(address in network for network in self.other_networks)
+        index = bisect_right(self.starts, value) - 1
+        return index >= 0 and value <= self.ends[index]
+
+    def __len__(self):
+        return len(self.starts) + len(self.other) + len(self.other_networks)
+
+    def __getstate__(self):
+        return (self.starts, self.ends, self.other, self.other_networks)
+
+    def __setstate__(self, state):
+        self.starts, self.ends, self.other, self.other_networks = state
+
+
+def load_blocked_ips():
+    """
+    Fetch the currently active blocked IPs from the database.
+    """
+    # is_active narrows the scan through the index; the expiry check keeps
+    # it exact for blocks that lapsed since the last deactivation pass
+    return BlockedIPSet.from_queryset(BlockedIP.objects.filter(is_active=True).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=Now())
+    ))
+
+
+def deactivate_expired_blocks():
+    """
+    Flip is_active off for blocks whose expiry has passed.
+    Returns the number of blocks deactivated.
+    """
+    return BlockedIP.objects.filter(
+        is_active=True, expires_at__lte=Now()
+    ).update(is_active=False)
+
+
+def get_blocked_ips():
+    """
+    Get the active blocked IPs: a per-process snapshot for up to
+    LOCAL_SNAPSHOT_TTL seconds, then the shared cache, then the database.
+    """
+    global _local_snapshot
+    now = time.monotonic()
+    snapshot = _local_snapshot
+    if snapshot is not None and snapshot[0] > now:
+        return snapshot[1]
+
+    blocked_ips = cache.get_or_set(
+        BLOCKED_IPS_CACHE_KEY, load_blocked_ips, BLOCKED_IPS_CACHE_TIMEOUT
+    )
+    _local_snapshot = (now + LOCAL_SNAPSHOT_TTL, blocked_ips)
+    return blocked_ips
+
+
+def refresh_blocked_ips():
+    """
+    Reload the blocked IPs from the database into the shared cache.
+    """
+    global _local_snapshot
+    blocked_ips = load_blocked_ips()
+    cache.set(BLOCKED_IPS_CACHE_KEY, blocked_ips, BLOCKED_IPS_CACHE_TIMEOUT)
+    _local_snapshot = None
+    return blocked_ips
+
+
+def invalidate_blocked_ips():
+    """
+    Drop the cached blocked IPs so the next lookup reloads them. Other
+    processes notice once their local snapshot expires.
+    """
+    global _local_snapshot
+    cache.delete(BLOCKED_IPS_CACHE_KEY)
+    _local_snapshot = None
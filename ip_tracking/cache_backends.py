@@ -0,0 +1,63 @@
+import pickle
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class CounterLocMemCache(LocMemCache):
+    """
+    LocMemCache fallback for deployments without Redis.
+
+    Integer values (rate-limit counters) are stored as-is instead of being
+    pickled, and keys are not validated, so the rate limiter's get/incr
+    path is a plain dict access. Other values are still pickled.
+    """
+
+    def make_and_validate_key(self, key, version=None):
+        return self.make_key(key, version=version)
+
+    def _dump(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _load(self, stored):
+        if type(stored) is int:
+            return stored
+        return pickle.loads(stored)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        stored = self._dump(value)
+        with self._lock:
+            if self._has_expired(key):
+                self._set(key, stored, timeout)
+                return True
+            return False
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        with self._lock:
+            if self._has_expired(key):
+                self._delete(key)
+                return default
+            stored = self._cache[key]
+            self._cache.move_to_end(key, last=False)
+        return self._load(stored)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        stored = self._dump(value)
+        with self._lock:
+            self._set(key, stored, timeout)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        with self._lock:
+            if self._has_expired(key):
+                self._delete(key)
+                raise ValueError("Key '%s' not found" % key)
+            new_value = self._load(self._cache[key]) + delta
+            self._cache[key] = self._dump(new_value)
+            self._cache.move_to_end(key, last=False)
+        return new_value
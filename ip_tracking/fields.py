@@ -0,0 +1,91 @@
+import ipaddress
+import socket
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+
+
+def pack_ip(ip):
+    """
+    Pack an IP address string: 4 bytes for IPv4, 16 for IPv6.
+    Raises ValueError for anything else.
+    """
+    try:
+        return socket.inet_pton(socket.AF_INET, ip)
+    except OSError:
+        pass
+    try:
+        return socket.inet_pton(socket.AF_INET6, ip)
+    except (OSError, TypeError):
+        raise ValueError(f"'{ip}' is not a valid IP address")
+
+
+def unpack_ip(packed):
+    """Convert packed bytes back to the address string."""
+    packed = bytes(packed)
+    if len(packed) == 4:
+        return socket.inet_ntop(socket.AF_INET, packed)
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+class PackedIPAddressField(models.Field):
+    """
+    IP address stored in its packed binary form (VARBINARY(16) / BYTEA).
+
+    An IPv4 address takes 4 bytes instead of up to 39 characters in
+    GenericIPAddressField's column, so its indexes are much smaller and
+    comparisons are on fixed-width bytes. IPv6 addresses use 16 bytes.
+    Python code sees the usual address strings.
+    """
+    description = "IP address (packed binary)"
+    empty_strings_allowed = False
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'bytea'
+        if connection.vendor == 'oracle':
+            return 'RAW(16)'
+        if connection.vendor == 'sqlite':
+            return 'blob'
+        return 'varbinary(16)'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return unpack_ip(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str) and not value:
+            return None
+        if isinstance(value, (bytes, memoryview)):
+            return unpack_ip(value)
+        try:
+            return str(ipaddress.ip_address(value))
+        except ValueError:
+            raise exceptions.ValidationError(
+                "Enter a valid IPv4 or IPv6 address.", code='invalid'
+            )
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or value == '':
+            return None
+        if isinstance(value, (bytes, memoryview)):
+            return bytes(value)
+        return pack_ip(str(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is not None:
+            return connection.Database.Binary(value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.GenericIPAddressField,
+            **kwargs,
+        })
@@ -0,0 +1,245 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import (
+    DatabaseError, InterfaceError, OperationalError, close_old_connections, transaction
+)
+from django.utils.dateparse import parse_datetime
+
+from .fields import pack_ip
+from .models import RequestLog
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LOG_BUFFER_KEY = 'req_log_buf'
+FLUSH_BATCH_SIZE = 500
+DATETIME_FIELDS = ('timestamp', 'geolocation_updated')
+# Rows buffered by an older release may carry columns that have since been
+# dropped (e.g. timezone, isp); only these keys are passed to RequestLog
+REQUEST_LOG_FIELDS = frozenset(field.attname for field in RequestLog._meta.concrete_fields)
+
+# In-process fallback when Redis is unavailable: a bounded queue drained by
+# a daemon thread. Rows are dropped when the queue is full.
+LOCAL_QUEUE_SIZE = 10000
+LOCAL_BATCH_SIZE = 1000
+LOCAL_FLUSH_INTERVAL = 0.1  # seconds
+
+_local_queue = queue.Queue(maxsize=LOCAL_QUEUE_SIZE)
+_writer_lock = threading.Lock()
+_writer = None
+
+
+def _get_redis():
+    """
+    Get the raw Redis client behind the default cache, or None if the cache
+    is not backed by django-redis (e.g. the LocMem fallback).
+    """
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def buffer_request_log(log_fields):
+    """
+    Queue a RequestLog row for the next bulk insert.
+
+    Rows go to the shared Redis list when available, otherwise to the
+    in-process queue. Returns False if the row was dropped.
+    """
+    client = _get_redis()
+    if client is not None:
+        try:
+            client.rpush(REQUEST_LOG_BUFFER_KEY, json.dumps(log_fields, cls=DjangoJSONEncoder))
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to buffer request log in Redis: {e}")
+
+    return _enqueue_local(log_fields)
+
+
+def _build_log(row):
+    """
+    Build a RequestLog from a buffered row. Raises TypeError or ValueError
+    for rows the database can never accept (e.g. an ip_address that is
+    not an IP), so callers can drop them instead of retrying.
+    """
+    log = RequestLog(**{key: value for key, value in row.items() if key in REQUEST_LOG_FIELDS})
+    pack_ip(log.ip_address)
+    return log
+
+
+def _build_logs(rows):
+    """
+    Build RequestLogs from buffered rows, logging and skipping bad rows.
+    """
+    logs = []
+    for row in rows:
+        try:
+            logs.append(_build_log(row))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Dropping malformed request log {row!r}: {e}")
+    return logs
+
+
+def _insert_logs(logs, batch_size):
+    """
+    bulk_create the logs. If the database rejects the batch for its data
+    rather than a connection problem, insert the rows one at a time and
+    drop the ones it refuses, so one bad row can't hold back the rest.
+    Connection errors propagate with nothing written.
+    Returns the number of rows written.
+    """
+    try:
+        RequestLog.objects.bulk_create(logs, batch_size=batch_size)
+        return len(logs)
+    except (OperationalError, InterfaceError):
+        raise
+    except (DatabaseError, TypeError, ValueError) as e:
+        logger.warning(f"Request log batch rejected, inserting rows one at a time: {e}")
+
+    written = 0
+    with transaction.atomic():
+        for log in logs:
+            try:
+                with transaction.atomic():
+                    RequestLog.objects.bulk_create([log])
+            except (OperationalError, InterfaceError):
+                raise
+            except (DatabaseError, TypeError, ValueError) as e:
+                logger.error(f"Dropping request log {log.ip_address} {log.path!r}: {e}")
+            else:
+                written += 1
+    return written
+
+
+def _enqueue_local(log_fields):
+    """
+    Put a row on the in-process queue, starting the writer thread if needed.
+    """
+    _ensure_writer()
+    try:
+        _local_queue.put_nowait(log_fields)
+        return True
+    except queue.Full:
+        return False
+
+
+def _ensure_writer():
+    """
+    Start the writer thread on first use (and again in a forked worker,
+    where the parent's thread no longer runs).
+    """
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            if _writer is None:
+                # The daemon thread dies with the process; write what's left
+                atexit.register(flush_local_queue)
+            _writer = threading.Thread(
+                target=_local_writer, name='request-log-writer', daemon=True
+            )
+            _writer.start()
+
+
+def _local_writer():
+    """
+    Drain the in-process queue, inserting up to LOCAL_BATCH_SIZE rows at a
+    time or whatever arrived within LOCAL_FLUSH_INTERVAL.
+    """
+    while True:
+        batch = [_local_queue.get()]
+        deadline = time.monotonic() + LOCAL_FLUSH_INTERVAL
+        while len(batch) < LOCAL_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_local_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            _insert_logs(_build_logs(batch), LOCAL_BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} request logs: {e}")
+        finally:
+            close_old_connections()
+
+
+def flush_local_queue():
+    """
+    Write every row still on the in-process queue (run at shutdown).
+    Returns the number of rows written.
+    """
+    batch = []
+    while True:
+        try:
+            batch.append(_local_queue.get_nowait())
+        except queue.Empty:
+            break
+    if not batch:
+        return 0
+
+    try:
+        return _insert_logs(_build_logs(batch), LOCAL_BATCH_SIZE)
+    except Exception as e:
+        logger.error(f"Failed to write {len(batch)} request logs at shutdown: {e}")
+        return 0
+
+
+def flush_request_logs(max_batches=20):
+    """
+    Move buffered rows into the database with bulk_create.
+    Returns the number of rows written.
+    """
+    client = _get_redis()
+    if client is None:
+        return 0
+
+    written = 0
+    for _ in range(max_batches):
+        # Read and trim atomically so concurrent flushes never insert a row twice
+        pipe = client.pipeline(transaction=True)
+        pipe.lrange(REQUEST_LOG_BUFFER_KEY, 0, FLUSH_BATCH_SIZE - 1)
+        pipe.ltrim(REQUEST_LOG_BUFFER_KEY, FLUSH_BATCH_SIZE, -1)
+        raw_rows, _ = pipe.execute()
+        if not raw_rows:
+            break
+
+        logs = []
+        valid_rows = []
+        for raw in raw_rows:
+            # Malformed rows are dropped here; pushing them back would
+            # fail every later flush along with the valid rows
+            try:
+                row = json.loads(raw)
+                for field in DATETIME_FIELDS:
+                    if row.get(field):
+                        row[field] = parse_datetime(row[field])
+                logs.append(_build_log(row))
+            except (AttributeError, TypeError, ValueError) as e:
+                logger.error(f"Dropping malformed buffered request log {raw!r}: {e}")
+                continue
+            valid_rows.append(raw)
+
+        try:
+            written += _insert_logs(logs, FLUSH_BATCH_SIZE)
+        except Exception:
+            # Nothing was written; put the batch back so the next flush retries it
+            if valid_rows:
+                client.rpush(REQUEST_LOG_BUFFER_KEY, *valid_rows)
+            raise
+
+        if len(raw_rows) < FLUSH_BATCH_SIZE:
+            break
+
+    return written
@@ -1,6 +1,7 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from ip_tracking.tasks import analyze_ip_behavior
 import json
+import time
 
 class Command(BaseCommand):
     help = 'Analyze behavior of a specific IP address'
@@ -16,7 +17,14 @@ class Command(BaseCommand):
         self.stdout.write(f"Analyzing IP {ip_address} (last {hours} hours)...")
         
         result = analyze_ip_behavior.delay(ip_address, hours)
-        analysis = result.get(timeout=10)  # Wait for result
+        
+        # Poll for the result (cheap against the Redis result backend)
+        deadline = time.monotonic() + 10
+        while not result.ready():
+            if time.monotonic() > deadline:
+                raise CommandError(f"Timed out waiting for analysis of {ip_address}")
+            time.sleep(0.05)
+        analysis = result.get()
         
         if 'error' in analysis:
             self.stdout.write(self.style.ERROR(analysis['error']))
@@ -3,6 +3,9 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from ip_tracking.models import BlockedIP
 import ipaddress
+import re
+
+RELATIVE_EXPIRY_RE = re.compile(r'^\+(\d+)d$')
 
 class Command(BaseCommand):
     """
@@ -13,6 +16,7 @@ class Command(BaseCommand):
     
     Examples:
         python manage.py block_ip 192.168.1.100
+        python manage.py block_ip 203.0.113.0/24  # whole network
         python manage.py block_ip 192.168.1.100 --reason "Spam bot"
         python manage.py block_ip 192.168.1.100 --expires "2024-12-31 23:59:59"
         python manage.py block_ip 192.168.1.100 --expires "+7d"  # 7 days from now
@@ -24,7 +28,7 @@ class Command(BaseCommand):
         parser.add_argument(
             'ip_address',
             type=str,
-            help='IP address to block'
+            help='IP address or CIDR network to block'
         )
         
         parser.add_argument(
@@ -53,78 +57,76 @@ class Command(BaseCommand):
         expires = options['expires']
         force = options['force']
         
-        # Validate IP address
-        try:
-            ipaddress.ip_address(ip_address)
-        except ValueError:
-            raise CommandError(f"Invalid IP address: {ip_address}")
+        # Validate IP address or network
+        prefix_length = None
+        if '/' in ip_address:
+            try:
+                network = ipaddress.ip_network(ip_address)
+            except ValueError as e:
+                raise CommandError(f"Invalid network: {e}")
+            ip_address = str(network.network_address)
+            prefix_length = network.prefixlen
+        else:
+            try:
+                ipaddress.ip_address(ip_address)
+            except ValueError:
+                raise CommandError(f"Invalid IP address: {ip_address}")
         
         # Parse expiration date
         expires_at = None
         if expires:
-            if expires.startswith('+'):
+            relative = RELATIVE_EXPIRY_RE.match(expires)
+            if relative:
                 # Relative time (e.g., +7d for 7 days)
-                try:
-                    days = int(expires[1:-1])
-                    if expires.endswith('d'):
-                        expires_at = timezone.now() + timedelta(days=days)
-                    else:
-                        raise CommandError("Relative time must end with 'd' (days)")
-                except (ValueError, IndexError):
-                    raise CommandError("Invalid relative time format. Use '+Nd' (e.g., '+7d')")
+                expires_at = timezone.now() + timedelta(days=int(relative.group(1)))
+            elif expires.startswith('+'):
+                raise CommandError("Invalid relative time format. Use '+Nd' (e.g., '+7d')")
             else:
-                # Absolute time
+                # Absolute time (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS)
                 try:
-                    expires_at = datetime.strptime(expires, '%Y-%m-%d %H:%M:%S')
-                    expires_at = timezone.make_aware(expires_at)
+                    expires_at = datetime.fromisoformat(expires)
                 except ValueError:
-                    try:
-                        expires_at = datetime.strptime(expires, '%Y-%m-%d')
-                        expires_at = timezone.make_aware(expires_at)
-                    except ValueError:
-                        raise CommandError(
-                            "Invalid date format. Use 'YYYY-MM-DD HH:MM:SS' or 'YYYY-MM-DD'"
-                        )
+                    raise CommandError(
+                        "Invalid date format. Use 'YYYY-MM-DD HH:MM:SS' or 'YYYY-MM-DD'"
+                    )
+                if timezone.is_naive(expires_at):
+                    expires_at = timezone.make_aware(expires_at)
         
         # Check if IP already exists
-        try:
-            blocked_ip = BlockedIP.objects.get(ip_address=ip_address)
-            
-            if not force:
-                raise CommandError(
-                    f"IP {ip_address} is already blocked. "
-                    f"Reason: {blocked_ip.reason}. "
-                    f"Use --force to update."
-                )
-            
-            # Update existing entry
-            blocked_ip.reason = reason or blocked_ip.reason
-            blocked_ip.expires_at = expires_at
-            blocked_ip.save()
-            
+        existing = BlockedIP.objects.filter(ip_address=ip_address).values('reason').first()
+        
+        if existing and not force:
+            raise CommandError(
+                f"IP {ip_address} is already blocked. "
+                f"Reason: {existing['reason']}. "
+                f"Use --force to update."
+            )
+        
+        # Create or update the block entry in one locked step
+        blocked_ip, created = BlockedIP.objects.update_or_create(
+            ip_address=ip_address,
+            defaults={
+                'prefix_length': prefix_length,
+                'reason': reason or (existing['reason'] if existing else ''),
+                'expires_at': expires_at,
+            }
+        )
+        
+        if created:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully updated block for IP: {ip_address}"
+                    f"Successfully blocked IP: {blocked_ip.get_network_display()}"
                 )
             )
-            
-        except BlockedIP.DoesNotExist:
-            # Create new block entry
-            BlockedIP.objects.create(
-                ip_address=ip_address,
-                reason=reason,
-                expires_at=expires_at
-            )
-            
+        else:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Successfully blocked IP: {ip_address}"
+                    f"Successfully updated block for IP: {blocked_ip.get_network_display()}"
                 )
             )
         
         # Display block information
-        blocked_ip = BlockedIP.objects.get(ip_address=ip_address)
-        self.stdout.write(f"IP Address: {blocked_ip.ip_address}")
+        self.stdout.write(f"IP Address: {blocked_ip.get_network_display()}")
         self.stdout.write(f"Reason: {blocked_ip.reason or 'Not specified'}")
         self.stdout.write(f"Created: {blocked_ip.created_at}")
         if blocked_ip.expires_at:
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ip_tracking.models import GeolocationCache
+
+class Command(BaseCommand):
+    """
+    Management command to delete expired geolocation cache entries.
+    
+    Expired entries are not deleted on read (the next lookup overwrites
+    them), so this removes the ones that are never looked up again.
+    
+    Usage:
+        python manage.py cleanup_geolocation_cache
+    """
+    
+    help = 'Delete expired geolocation cache entries'
+    
+    def handle(self, *args, **options):
+        deleted, _ = GeolocationCache.objects.filter(
+            expires_at__lt=timezone.now()
+        ).delete()
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} expired geolocation cache entries"
+            )
+        )
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from ip_tracking.models import BlockedIP
-from django.db.models import Q
+from django.db.models import BooleanField, Case, Value, When
+from django.db.models.functions import Now
 
 class Command(BaseCommand):
     """
@@ -29,32 +29,40 @@ class Command(BaseCommand):
         )
     
     def handle(self, *args, **options):
-        blocked_ips = BlockedIP.objects.all()
+        # Let the database work out expiry for each row
+        blocked_ips = BlockedIP.objects.order_by('-created_at').only(
+            'ip_address', 'prefix_length', 'reason', 'created_at', 'expires_at'
+        ).annotate(
+            _expired=Case(
+                When(expires_at__lt=Now(), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
         
         if options['active']:
-            blocked_ips = blocked_ips.filter(
-                Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
-            )
+            blocked_ips = blocked_ips.filter(_expired=False)
             self.stdout.write("Active Blocked IPs:")
         elif options['expired']:
-            blocked_ips = blocked_ips.filter(expires_at__lt=timezone.now())
+            blocked_ips = blocked_ips.filter(_expired=True)
             self.stdout.write("Expired Blocked IPs:")
         else:
             self.stdout.write("All Blocked IPs:")
         
-        if not blocked_ips:
-            self.stdout.write(self.style.WARNING("No blocked IPs found"))
-            return
+        found = False
         
-        for blocked_ip in blocked_ips:
-            status = "ACTIVE"
-            if blocked_ip.expires_at and blocked_ip.expires_at < timezone.now():
-                status = "EXPIRED"
+        # Stream rows instead of loading the whole table into memory
+        for blocked_ip in blocked_ips.iterator(chunk_size=1000):
+            found = True
+            status = "EXPIRED" if blocked_ip._expired else "ACTIVE"
             
             self.stdout.write(
-                f"{blocked_ip.ip_address:<20} | "
+                f"{blocked_ip.get_network_display():<20} | "
                 f"Reason: {blocked_ip.reason or 'N/A':<30} | "
                 f"Created: {blocked_ip.created_at.strftime('%Y-%m-%d'):<12} | "
                 f"Expires: {blocked_ip.expires_at.strftime('%Y-%m-%d') if blocked_ip.expires_at else 'Never':<12} | "
                 f"Status: {status}"
-            )
\ No newline at end of file
+            )
+        
+        if not found:
+            self.stdout.write(self.style.WARNING("No blocked IPs found"))
\ No newline at end of file
@@ -3,7 +3,18 @@ from django.utils import timezone
 from datetime import timedelta
 from ip_tracking.models import RequestLog, GeolocationCache
 from ip_tracking.middleware import BasicIPLoggingMiddleware
-import sys
+from django.db import connection, transaction
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+GEOLOCATION_FIELDS = [
+    'country', 'country_code', 'city', 'region', 'latitude', 'longitude',
+    'geolocation_updated', 'geolocation_source',
+]
+BULK_UPDATE_BATCH_SIZE = 10000
+LOOKUP_WORKERS = 32  # keep within the middleware's GEOLOCATION_SERVICE_THREADS / providers
+LOOKUP_CHUNK_SIZE = 1000
+ITERATOR_CHUNK_SIZE = 500
 
 class Command(BaseCommand):
     """
@@ -54,20 +65,20 @@ class Command(BaseCommand):
             # Update all logs without geolocation
             logs = RequestLog.objects.filter(
                 country__isnull=True
-            ).order_by('-timestamp')[:options['limit']]
+            ).order_by('-timestamp').values_list('id', 'ip_address')[:options['limit']]
             
-            self.stdout.write(f"Updating {len(logs)} logs without geolocation...")
-            self.update_logs_geolocation(middleware, logs)
+            self.stdout.write(f"Updating {logs.count()} logs without geolocation...")
+            self.update_logs_geolocation(middleware, logs.iterator(chunk_size=ITERATOR_CHUNK_SIZE))
         
         elif options['recent']:
             # Update recent logs
             week_ago = timezone.now() - timedelta(days=7)
             logs = RequestLog.objects.filter(
                 timestamp__gte=week_ago
-            ).order_by('-timestamp')[:options['limit']]
+            ).order_by('-timestamp').values_list('id', 'ip_address')[:options['limit']]
             
-            self.stdout.write(f"Updating {len(logs)} recent logs...")
-            self.update_logs_geolocation(middleware, logs)
+            self.stdout.write(f"Updating {logs.count()} recent logs...")
+            self.update_logs_geolocation(middleware, logs.iterator(chunk_size=ITERATOR_CHUNK_SIZE))
         
         else:
             self.stdout.write(
@@ -93,33 +104,85 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("Failed to get geolocation"))
     
     def update_logs_geolocation(self, middleware, logs):
-        """Update geolocation for multiple logs"""
+        """
+        Update geolocation for multiple logs, given as an iterable of
+        (id, ip_address) rows consumed in chunks
+        """
         updated_count = 0
+        to_update = []
+        results = {}
+        logs = iter(logs)
         
-        for log in logs:
-            geolocation_data = middleware.get_geolocation_data(log.ip_address)
+        while True:
+            chunk = list(islice(logs, LOOKUP_CHUNK_SIZE))
+            if not chunk:
+                break
             
-            if geolocation_data and geolocation_data.get('source') not in ['private_ip', 'failed']:
-                log.country = geolocation_data.get('country')
-                log.country_code = geolocation_data.get('country_code')
-                log.city = geolocation_data.get('city')
-                log.region = geolocation_data.get('region')
-                log.latitude = geolocation_data.get('latitude')
-                log.longitude = geolocation_data.get('longitude')
-                log.timezone = geolocation_data.get('timezone')
-                log.isp = geolocation_data.get('isp')
-                log.geolocation_updated = timezone.now()
-                log.geolocation_source = geolocation_data.get('source')
-                
-                log.save()
-                updated_count += 1
+            # Lookups are network-bound, so resolve each new distinct IP concurrently
+            ips = {ip_address for _, ip_address in chunk} - results.keys()
+            results.update(self.lookup_ips(middleware, ips))
+            now = timezone.now()
+            
+            for log_id, ip_address in chunk:
+                geolocation_data = results.get(ip_address)
                 
-                # Show progress
-                if updated_count % 10 == 0:
-                    self.stdout.write(f"Updated {updated_count} logs...")
+                if geolocation_data and geolocation_data.get('source') not in ['private_ip', 'failed']:
+                    # Unsaved instance carrying just the pk and the fields to write
+                    to_update.append(RequestLog(
+                        id=log_id,
+                        country=geolocation_data.get('country'),
+                        country_code=geolocation_data.get('country_code'),
+                        city=geolocation_data.get('city'),
+                        region=geolocation_data.get('region'),
+                        latitude=geolocation_data.get('latitude'),
+                        longitude=geolocation_data.get('longitude'),
+                        geolocation_updated=now,
+                        geolocation_source=geolocation_data.get('source'),
+                    ))
+                    
+                    # Flush periodically so memory stays bounded
+                    if len(to_update) >= BULK_UPDATE_BATCH_SIZE:
+                        updated_count += self.save_logs(to_update)
+                        to_update = []
+                        self.stdout.write(f"Updated {updated_count} logs...")
+        
+        if to_update:
+            updated_count += self.save_logs(to_update)
         
         self.stdout.write(
             self.style.SUCCESS(
                 f"Successfully updated {updated_count} logs with geolocation data"
             )
-        )
\ No newline at end of file
+        )
+    
+    def lookup_ips(self, middleware, ips):
+        """
+        Resolve geolocation for a set of IPs: cached entries first, then
+        ip-api.com batches, then a thread pool of per-IP lookups
+        """
+        results = middleware.get_cached_geolocation_many(ips)
+        misses = [ip_address for ip_address in ips if ip_address not in results]
+        
+        results.update(middleware.get_geolocation_batch(misses))
+        remaining = [ip_address for ip_address in misses if ip_address not in results]
+        if not remaining:
+            return results
+        
+        def lookup(ip_address):
+            try:
+                return middleware.get_geolocation_data(ip_address)
+            finally:
+                # Worker threads get their own DB connection; don't leak it
+                connection.close()
+        
+        with ThreadPoolExecutor(max_workers=LOOKUP_WORKERS) as executor:
+            results.update(zip(remaining, executor.map(lookup, remaining)))
+        return results
+    
+    def save_logs(self, logs):
+        """Write geolocation fields for a batch of logs in bulk UPDATEs"""
+        with transaction.atomic():
+            RequestLog.objects.bulk_update(
+                logs, fields=GEOLOCATION_FIELDS, batch_size=BULK_UPDATE_BATCH_SIZE
+            )
+        return len(logs)
@@ -1,12 +1,130 @@
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from django.utils import timezone
 from django.http import HttpResponseForbidden
 from django.core.cache import cache
-from .models import RequestLog, BlockedIP, GeolocationCache
-import requests
+from django.db import connection
+from .fields import pack_ip
+from .models import GeolocationCache
+from . import blocklist, log_buffer
+import ipaddress
+import logging
+import orjson
+import socket
+import struct
 import time
+import requests
+from bisect import bisect_right
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import timedelta
 
+logger = logging.getLogger(__name__)
+
+# Shared HTTP session so geolocation lookups reuse TCP/TLS connections
+http_session = requests.Session()
+_http_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=1, backoff_factor=0.1),
+)
+http_session.mount('https://', _http_adapter)
+http_session.mount('http://', _http_adapter)
+http_session.headers.update({'User-Agent': 'Django IP Tracking Middleware'})
+
+IPAPI_URL = 'https://ipapi.co/{}/json/'
+IPINFO_URL = 'https://ipinfo.io/{}/json'
+
+# ip-api.com batch endpoint (free tier is HTTP only, 100 IPs per POST)
+IP_API_BATCH_URL = 'http://ip-api.com/batch'
+IP_API_BATCH_SIZE = 100
+IP_API_BATCH_FIELDS = 'status,query,country,countryCode,city,regionName,lat,lon,timezone,isp'
+
+# Threads for hedged provider calls (see _query_services). Each caller can
+# have one call in flight per provider, so the default covers
+# update_geolocation's 32 lookup workers racing all three providers;
+# threads are only started as they are needed
+GEOLOCATION_SERVICE_THREADS = getattr(settings, 'GEOLOCATION_SERVICE_THREADS', 32 * 3)
+_service_pool = ThreadPoolExecutor(
+    max_workers=GEOLOCATION_SERVICE_THREADS, thread_name_prefix='geolocation'
+)
+
+# Parse IPv4 addresses in C; the Struct is compiled once
+_inet_pton = socket.inet_pton
+_unpack_ipv4 = struct.Struct('!I').unpack
+
+# Private/local IPv4 ranges as (first, last) integers, computed once at import
+_PRIVATE_NETS = [
+    ipaddress.ip_network(net) for net in (
+        '10.0.0.0/8',
+        '127.0.0.0/8',
+        '192.168.0.0/16',
+        '172.16.0.0/12',
+        '169.254.0.0/16',  # Link-local
+    )
+]
+_PRIVATE_RANGES = tuple(sorted(
+    (int(net.network_address), int(net.broadcast_address)) for net in _PRIVATE_NETS
+))
+# Range map for bisect: the ranges don't overlap, so at most one can match
+_PRIVATE_STARTS = tuple(start for start, _ in _PRIVATE_RANGES)
+_PRIVATE_ENDS = tuple(end for _, end in _PRIVATE_RANGES)
+
+GEOLOCATION_PENDING_TTL = 60  # seconds; one background lookup per IP per window
+GEOLOCATION_TASK_COUNTDOWN = 5  # seconds; lets buffered logs reach the table first
+GEOLOCATION_FAILED_TTL = 5 * 60  # seconds; failed lookups are not retried sooner
+GEOLOCATION_LOCK_TTL = 10  # seconds; upper bound on one upstream lookup
+GEOLOCATION_LOCK_WAIT = 3  # seconds a concurrent caller waits for the result
+GEOLOCATION_HEDGE_DELAY = 0.5  # seconds before the next provider is also tried
+# Geolocation keys copied onto a RequestLog row
+GEOLOCATION_LOG_FIELDS = (
+    'country', 'country_code', 'city', 'region',
+    'latitude', 'longitude',
+)
+
+# GeolocationCache columns rewritten when an existing entry is refreshed
+GEOLOCATION_CACHE_UPDATE_FIELDS = [
+    'country', 'country_code', 'city', 'region', 'latitude', 'longitude',
+    'timezone', 'isp', 'expires_at', 'updated_at',
+]
+
+
+def _open_geoip_reader():
+    """
+    Open the MaxMind database at GEOIP_DB_PATH memory-mapped, so all worker
+    processes share it through the page cache. Returns None if not configured.
+    """
+    path = getattr(settings, 'GEOIP_DB_PATH', None)
+    if not path:
+        return None
+    try:
+        import maxminddb
+        return maxminddb.open_database(path, maxminddb.MODE_MMAP)
+    except (ImportError, OSError, ValueError) as e:
+        logger.warning(f"GeoIP database unavailable, using HTTP services only: {e}")
+        return None
+
+_geoip_reader = _open_geoip_reader()
+
+def _is_ip_address(value):
+    """Check whether a string is an IPv4 or IPv6 address"""
+    if not value:
+        return False
+    try:
+        pack_ip(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+FAILED_GEOLOCATION = {
+    'country': 'Unknown',
+    'country_code': '??',
+    'city': 'Unknown',
+    'region': 'Unknown',
+    'source': 'failed',
+}
+
 class BasicIPLoggingMiddleware(MiddlewareMixin):
     """
     Enhanced middleware with geolocation capabilities.
@@ -14,10 +132,12 @@ class BasicIPLoggingMiddleware(MiddlewareMixin):
     
     def __init__(self, get_response):
         self.get_response = get_response
-        # Cache for blocked IPs
-        self.blocked_ips_cache = None
-        self.cache_timeout = 60
-        self.last_cache_update = 0
+        # Switch to MiddlewareMixin.__acall__ when the handler chain is async
+        # (ASGI). Its thread-sensitive executor keeps the ORM calls in the
+        # hooks (blocked IP and geolocation cache misses) on the thread
+        # whose connections Django closes. MiddlewareMixin.__init__ isn't
+        # used since get_response may be None
+        self._async_check()
         
         # Geolocation settings
         self.geolocation_enabled = True
@@ -26,50 +146,54 @@ class BasicIPLoggingMiddleware(MiddlewareMixin):
             self._get_ipapi_location,
             self._get_ipinfo_location,
         ]
+        if _geoip_reader is not None:
+            # Local lookups take microseconds; remote services only run on a miss
+            self.geolocation_services.insert(0, self._get_mmdb_location)
     
     def get_client_ip(self, request):
         """
         Extract client IP address from request headers.
+        The result is cached on the request.
         """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        try:
+            return request._client_ip
+        except AttributeError:
+            pass
         
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        ip = None
         if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0].strip()
-        else:
+            # Only the first hop is needed; don't split the whole proxy chain
+            ip = x_forwarded_for.split(',', 1)[0].strip()
+        
+        # RequestLog only stores real addresses, so headers like
+        # "X-Forwarded-For: unknown" fall back to the peer address
+        if not _is_ip_address(ip):
             ip = request.META.get('REMOTE_ADDR')
+            if not _is_ip_address(ip):
+                ip = '0.0.0.0'
         
-        return ip or '0.0.0.0'
+        request._client_ip = ip
+        return ip
     
     def get_blocked_ips(self):
         """
-        Get blocked IPs from cache or database.
+        Get blocked IPs from the shared cache (shared by all workers).
         """
-        current_time = time.time()
-        
-        if (self.blocked_ips_cache is not None and 
-            current_time - self.last_cache_update < self.cache_timeout):
-            return self.blocked_ips_cache
-        
-        from django.db.models import Q
-        active_blocks = BlockedIP.objects.filter(
-            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
-        ).values_list('ip_address', flat=True)
-        
-        self.blocked_ips_cache = set(active_blocks)
-        self.last_cache_update = current_time
-        
-        return self.blocked_ips_cache
+        return blocklist.get_blocked_ips()
     
     def is_ip_blocked(self, ip_address):
         """
         Check if an IP address is blocked.
         """
-        blocked_ips = self.get_blocked_ips()
-        return ip_address in blocked_ips
+        # One binary search over the merged ranges (see BlockedIPSet)
+        return ip_address in self.get_blocked_ips()
     
-    def get_geolocation_data(self, ip_address):
+    def get_geolocation_data(self, ip_address, fetch=True):
         """
         Get geolocation data for an IP address with caching.
+        With fetch=False only the caches are consulted: an expired database
+        entry is returned with source 'stale_cache', and None on a miss.
         """
         # Skip geolocation for private/local IPs
         if self._is_private_ip(ip_address):
@@ -86,42 +210,71 @@ class BasicIPLoggingMiddleware(MiddlewareMixin):
         cached_data = cache.get(cache_key)
         
         if cached_data:
-            cached_data['source'] = 'memory_cache'
+            # Negative entries keep their 'failed' source
+            if cached_data.get('source') != 'failed':
+                cached_data['source'] = 'memory_cache'
             return cached_data
         
         # Check database cache if GeolocationCache model exists
         db_cached = None
         try:
             # Try to use the GeolocationCache model if it exists
-            db_cached = self._get_db_cached_location(ip_address)
+            db_cached = self._get_db_cached_location(ip_address, allow_stale=not fetch)
         except Exception:
             # If model doesn't exist or has issues, skip database cache
             pass
         
-        if db_cached:
+        if db_cached and db_cached['source'] != 'stale_cache':
             # Also store in memory cache
             cache.set(cache_key, db_cached, self.geolocation_cache_ttl)
             return db_cached
         
+        if not fetch:
+            # The local database needs no network, so it's fine on the request path
+            if _geoip_reader is not None:
+                local_data = self._get_mmdb_location(ip_address)
+                if local_data:
+                    local_data['source'] = '_get_mmdb_location'
+                    cache.set(cache_key, local_data, self.geolocation_cache_ttl)
+                    return local_data
+            # Serve an expired entry (if any) while a worker refreshes it
+            return db_cached
+        
+        # Only one caller fetches a given IP; concurrent callers wait for it
+        lock_key = f"geolocation_lock:{ip_address}"
+        if not cache.add(lock_key, 1, GEOLOCATION_LOCK_TTL):
+            return self._wait_for_geolocation(cache_key)
+        
+        try:
+            return self._fetch_geolocation(ip_address, cache_key)
+        finally:
+            cache.delete(lock_key)
+    
+    def _wait_for_geolocation(self, cache_key):
+        """
+        Poll the cache with exponential backoff while another caller fetches.
+        """
+        delay = 0.05
+        deadline = time.monotonic() + GEOLOCATION_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            cached_data = cache.get(cache_key)
+            if cached_data:
+                return cached_data
+            delay = min(delay * 2, 0.5)
+        return dict(FAILED_GEOLOCATION)
+    
+    def _fetch_geolocation(self, ip_address, cache_key):
+        """
+        Get geolocation data from the external services and cache the result.
+        """
         # Get from external API (try multiple services)
-        geolocation_data = None
-        for service in self.geolocation_services:
-            try:
-                geolocation_data = service(ip_address)
-                if geolocation_data:
-                    geolocation_data['source'] = service.__name__
-                    break
-            except Exception as e:
-                continue
+        geolocation_data = self._query_services(ip_address)
         
         if not geolocation_data:
-            geolocation_data = {
-                'country': 'Unknown',
-                'country_code': '??',
-                'city': 'Unknown',
-                'region': 'Unknown',
-                'source': 'failed',
-            }
+            geolocation_data = dict(FAILED_GEOLOCATION)
+            # Short negative cache so a dead upstream isn't hit on every lookup
+            cache.set(cache_key, geolocation_data, GEOLOCATION_FAILED_TTL)
         
         # Cache the results
         if geolocation_data.get('source') not in ['private_ip', 'failed']:
@@ -137,25 +290,64 @@ class BasicIPLoggingMiddleware(MiddlewareMixin):
         
         return geolocation_data
     
-    def _get_db_cached_location(self, ip_address):
+    def _query_services(self, ip_address):
+        """
+        Query the geolocation services as a hedged race: the next service is
+        started once the previous one fails or is slower than
+        GEOLOCATION_HEDGE_DELAY, and the first successful answer wins.
+        """
+        services = iter(self.geolocation_services)
+        pending = {}
+        
+        while True:
+            service = next(services, None)
+            if service is not None:
+                pending[_service_pool.submit(service, ip_address)] = service.__name__
+            if not pending:
+                return None
+            
+            done, _ = wait(
+                pending,
+                timeout=GEOLOCATION_HEDGE_DELAY if service is not None else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    geolocation_data = future.result()
+                except Exception:
+                    continue
+                if geolocation_data:
+                    # Slower calls still in flight finish on their own timeout
+                    for other in pending:
+                        other.cancel()
+                    geolocation_data['source'] = source
+                    return geolocation_data
+    
+    def schedule_geolocation(self, ip_address):
+        """
+        Queue a background lookup that fills in geolocation for this IP's logs.
+        """
+        from .tasks import enrich_log_geolocation
+        
+        # Only the first miss in the window enqueues a task
+        if cache.add(f"geolocation_pending:{ip_address}", 1, GEOLOCATION_PENDING_TTL):
+            enrich_log_geolocation.apply_async(
+                args=[ip_address], countdown=GEOLOCATION_TASK_COUNTDOWN
+            )
+    
+    def _get_db_cached_location(self, ip_address, allow_stale=False):
         """Get geolocation data from database cache"""
         try:
             cache_entry = GeolocationCache.objects.get(ip_address=ip_address)
-            if not cache_entry.is_expired():
-                return {
-                    'country': cache_entry.country,
-                    'country_code': cache_entry.country_code,
-                    'city': cache_entry.city,
-                    'region': cache_entry.region,
-                    'latitude': float(cache_entry.latitude) if cache_entry.latitude else None,
-                    'longitude': float(cache_entry.longitude) if cache_entry.longitude else None,
-                    'timezone': cache_entry.timezone,
-                    'isp': cache_entry.isp,
-                    'source': 'cache',
-                }
+            expired = cache_entry.is_expired()
+            if not expired or allow_stale:
+                return self._cache_entry_to_location(
+                    cache_entry, 'stale_cache' if expired else 'cache'
+                )
             else:
-                # Delete expired cache entry
-                cache_entry.delete()
+                # The next upsert overwrites the row; cleanup_geolocation_cache
+                # removes entries that are never refreshed
                 return None
         except GeolocationCache.DoesNotExist:
             return None
@@ -163,84 +355,218 @@ class BasicIPLoggingMiddleware(MiddlewareMixin):
             # If any error occurs (e.g., table doesn't exist), return None
             return None
     
+    def _cache_entry_to_location(self, cache_entry, source):
+        """Convert a GeolocationCache row to a geolocation dict"""
+        return {
+            'country': cache_entry.country,
+            'country_code': cache_entry.country_code,
+            'city': cache_entry.city,
+            'region': cache_entry.region,
+            'latitude': cache_entry.latitude,
+            'longitude': cache_entry.longitude,
+            'timezone': cache_entry.timezone,
+            'isp': cache_entry.isp,
+            'source': source,
+        }
+    
+    def get_cached_geolocation_many(self, ip_addresses):
+        """
+        Look up many IPs in the caches only: one get_many against the memory
+        cache, then one query for the database cache. Returns {ip: data} for
+        the hits; private, expired and missing IPs are left out.
+        """
+        keys = {f"geolocation:{ip}": ip for ip in ip_addresses if not self._is_private_ip(ip)}
+        results = {}
+        for key, data in cache.get_many(keys).items():
+            if data.get('source') != 'failed':
+                data['source'] = 'memory_cache'
+            results[keys[key]] = data
+        
+        misses = [ip for ip in keys.values() if ip not in results]
+        if not misses:
+            return results
+        
+        db_hits = {}
+        try:
+            for cache_entry in GeolocationCache.objects.filter(
+                ip_address__in=misses, expires_at__gt=timezone.now()
+            ):
+                db_hits[cache_entry.ip_address] = self._cache_entry_to_location(cache_entry, 'cache')
+        except Exception:
+            # Database cache unavailable; callers resolve the misses
+            return results
+        
+        if db_hits:
+            cache.set_many(
+                {f"geolocation:{ip}": data for ip, data in db_hits.items()},
+                self.geolocation_cache_ttl
+            )
+            results.update(db_hits)
+        return results
+    
     def _set_db_cached_location(self, ip_address, data, ttl_hours=24):
         """Cache geolocation data in database"""
-        from datetime import timedelta
-        
         expires_at = timezone.now() + timedelta(hours=ttl_hours)
-        
-        GeolocationCache.objects.update_or_create(
-            ip_address=ip_address,
-            defaults={
-                'country': data.get('country'),
-                'country_code': data.get('country_code'),
-                'city': data.get('city'),
-                'region': data.get('region'),
-                'latitude': data.get('latitude'),
-                'longitude': data.get('longitude'),
-                'timezone': data.get('timezone'),
-                'isp': data.get('isp'),
-                'expires_at': expires_at,
-            }
+        self._upsert_db_cached_locations({ip_address: data}, expires_at)
+    
+    def _upsert_db_cached_locations(self, results, expires_at):
+        """
+        Insert or refresh GeolocationCache rows for {ip: data} in a single
+        INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE statement.
+        """
+        # MySQL upserts on any unique key and rejects an explicit target
+        unique_fields = (
+            ['ip_address']
+            if connection.features.supports_update_conflicts_with_target
+            else None
+        )
+        GeolocationCache.objects.bulk_create(
+            [
+                GeolocationCache(
+                    ip_address=ip,
+                    country=data.get('country'),
+                    country_code=data.get('country_code'),
+                    city=data.get('city'),
+                    region=data.get('region'),
+                    latitude=data.get('latitude'),
+                    longitude=data.get('longitude'),
+                    timezone=data.get('timezone'),
+                    isp=data.get('isp'),
+                    expires_at=expires_at,
+                )
+                for ip, data in results.items()
+            ],
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=GEOLOCATION_CACHE_UPDATE_FIELDS,
         )
     
     def _is_private_ip(self, ip_address):
         """
         Check if IP is private/local.
         """
-        private_ranges = [
-            ('10.0.0.0', '10.255.255.255'),
-            ('172.16.0.0', '172.31.255.255'),
-            ('192.168.0.0', '192.168.255.255'),
-            ('127.0.0.0', '127.255.255.255'),
-            ('169.254.0.0', '169.254.255.255'),  # Link-local
-        ]
-        
         # Convert IP to integer for comparison
         try:
             ip_int = self._ip_to_int(ip_address)
-        except (ValueError, AttributeError):
-            return False
-        
-        for start_str, end_str in private_ranges:
+        except (OSError, TypeError):
+            # Not IPv4: let ipaddress classify IPv6 (::1, fc00::/7, fe80::/10)
             try:
-                start_int = self._ip_to_int(start_str)
-                end_int = self._ip_to_int(end_str)
-                if start_int <= ip_int <= end_int:
-                    return True
-            except (ValueError, AttributeError):
-                continue
+                address = ipaddress.ip_address(ip_address)
+            except ValueError:
+                return False
+            return address.is_private or address.is_loopback or address.is_link_local
         
-        return False
+        # Last range starting at or below the address is the only candidate
+        index = bisect_right(_PRIVATE_STARTS, ip_int) - 1
+        return index >= 0 and ip_int <= _PRIVATE_ENDS[index]
     
     def _ip_to_int(self, ip):
         """
-        Convert IP string to integer.
+        Convert IP string to integer (raises OSError if not dotted-quad IPv4).
+        """
+        return _unpack_ipv4(_inet_pton(socket.AF_INET, ip))[0]
+    
+    def get_geolocation_batch(self, ip_addresses):
+        """
+        Resolve many IPs with ip-api.com's batch endpoint and cache the
+        results. Returns {ip: data} for the IPs that were resolved; callers
+        fall back to get_geolocation_data for the rest.
+        """
+        ips = [ip for ip in ip_addresses if not self._is_private_ip(ip)]
+        results = {}
+        
+        for start in range(0, len(ips), IP_API_BATCH_SIZE):
+            batch = ips[start:start + IP_API_BATCH_SIZE]
+            try:
+                response = http_session.post(
+                    IP_API_BATCH_URL,
+                    params={'fields': IP_API_BATCH_FIELDS},
+                    json=[{'query': ip} for ip in batch],
+                    timeout=5,
+                )
+                if response.status_code != 200:
+                    # Rate limited or down; leave the rest to the per-IP services
+                    break
+                rows = orjson.loads(response.content)
+            except Exception:
+                break
+            
+            for row in rows:
+                if row.get('status') == 'success':
+                    results[row['query']] = {
+                        'country': row.get('country'),
+                        'country_code': row.get('countryCode'),
+                        'city': row.get('city'),
+                        'region': row.get('regionName'),
+                        'latitude': row.get('lat'),
+                        'longitude': row.get('lon'),
+                        'timezone': row.get('timezone'),
+                        'isp': row.get('isp'),
+                        'source': 'ip_api_batch',
+                    }
+        
+        if results:
+            self._cache_many_locations(results)
+        return results
+    
+    def _cache_many_locations(self, results):
+        """Store {ip: data} in the memory cache and the database cache"""
+        cache.set_many(
+            {f"geolocation:{ip}": data for ip, data in results.items()},
+            self.geolocation_cache_ttl
+        )
+        
+        expires_at = timezone.now() + timedelta(seconds=self.geolocation_cache_ttl)
+        try:
+            self._upsert_db_cached_locations(results, expires_at)
+        except Exception:
+            # The memory cache still has the results
+            pass
+    
+    def _get_mmdb_location(self, ip_address):
+        """
+        Get location data from the local MaxMind GeoLite2-City database.
         """
-        octets = ip.split('.')
-        return (int(octets[0]) << 24) + (int(octets[1]) << 16) + \
-               (int(octets[2]) << 8) + int(octets[3])
+        try:
+            record = _geoip_reader.get(ip_address)
+        except ValueError:
+            return None
+        
+        if not record:
+            return None
+        
+        country = record.get('country', {})
+        location = record.get('location', {})
+        subdivisions = record.get('subdivisions') or [{}]
+        return {
+            'country': country.get('names', {}).get('en'),
+            'country_code': country.get('iso_code'),
+            'city': record.get('city', {}).get('names', {}).get('en'),
+            'region': subdivisions[0].get('names', {}).get('en'),
+            'latitude': location.get('latitude'),
+            'longitude': location.get('longitude'),
+            'timezone': location.get('time_zone'),
+            'isp': None,
+        }
     
     def _get_ipapi_location(self, ip_address):
         """
         Get location data from ipapi.co (free tier: 1000 requests/month).
         """
         try:
-            response = requests.get(
-                f'https://ipapi.co/{ip_address}/json/',
-                timeout=3,
-                headers={'User-Agent': 'Django IP Tracking Middleware'}
-            )
+            response = http_session.get(IPAPI_URL.format(ip_address), timeout=3)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
+                latitude = data.get('latitude')
+                longitude = data.get('longitude')
                 return {
                     'country': data.get('country_name'),
                     'country_code': data.get('country_code'),
                     'city': data.get('city'),
                     'region': data.get('region'),
-                    'latitude': float(data.get('latitude')) if data.get('latitude') else None,
-                    'longitude': float(data.get('longitude')) if data.get('longitude') else None,
+                    'latitude': float(latitude) if latitude else None,
+                    'longitude': float(longitude) if longitude else None,
                     'timezone': data.get('timezone'),
                     'isp': data.get('org'),
                 }
@@ -254,13 +580,10 @@ class BasicIPLoggingMiddleware(MiddlewareMixin):
         Get location data from ipinfo.io (free tier: 50,000 requests/month).
         """
         try:
-            response = requests.get(
-                f'https://ipinfo.io/{ip_address}/json',
-                timeout=3
-            )
+            response = http_session.get(IPINFO_URL.format(ip_address), timeout=3)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 
                 # Parse location coordinates if available
                 latitude = longitude = None
@@ -294,19 +617,22 @@ class BasicIPLoggingMiddleware(MiddlewareMixin):
         """
         client_ip = self.get_client_ip(request)
         
-        if self.is_ip_blocked(client_ip):
-            # Log the blocked attempt (without geolocation)
-            try:
-                RequestLog.objects.create(
-                    ip_address=client_ip,
-                    path=request.path,
-                    timestamp=timezone.now(),
-                    country='Blocked',
-                    city='N/A',
-                )
-            except Exception:
-                # If logging fails, still block the request
-                pass
+        # Remember the result so process_response doesn't repeat the work;
+        # the request start time is also the log timestamp
+        request._now = timezone.now()
+        request._ip_blocked = self.is_ip_blocked(client_ip)
+        
+        if request._ip_blocked:
+            # Log the blocked attempt (without geolocation) through the
+            # buffer, so a flood from blocked IPs never touches the database
+            log_buffer.buffer_request_log({
+                'ip_address': client_ip,
+                'path': request.path,
+                'timestamp': request._now,
+                'status_code': 403,
+                'country': 'Blocked',
+                'city': 'N/A',
+            })
             
             return HttpResponseForbidden(
                 "<h1>403 Forbidden</h1>"
@@ -320,47 +646,49 @@ class BasicIPLoggingMiddleware(MiddlewareMixin):
         """
         Log request information with geolocation data.
         """
+        # process_request may not have run if an earlier middleware
+        # returned a response
         client_ip = self.get_client_ip(request)
+        if not hasattr(request, '_ip_blocked'):
+            request._now = timezone.now()
+            request._ip_blocked = self.is_ip_blocked(client_ip)
         
         # Skip if IP is blocked (already logged in process_request)
-        if self.is_ip_blocked(client_ip):
+        if request._ip_blocked:
             return response
         
-        # Get geolocation data
+        # Get cached geolocation data; misses are resolved by a Celery worker
+        # so the response never waits on the external services
         geolocation_data = {}
         if self.geolocation_enabled:
             try:
-                geolocation_data = self.get_geolocation_data(client_ip)
+                geolocation_data = self.get_geolocation_data(client_ip, fetch=False)
+                if geolocation_data is None:
+                    geolocation_data = {}
+                    self.schedule_geolocation(client_ip)
+                elif geolocation_data['source'] == 'stale_cache':
+                    self.schedule_geolocation(client_ip)
             except Exception:
                 geolocation_data = {}
         
-        # Create log entry
-        try:
-            RequestLog.objects.create(
-                ip_address=client_ip,
-                path=request.path,
-                timestamp=timezone.now(),
-                country=geolocation_data.get('country'),
-                country_code=geolocation_data.get('country_code'),
-                city=geolocation_data.get('city'),
-                region=geolocation_data.get('region'),
-                latitude=geolocation_data.get('latitude'),
-                longitude=geolocation_data.get('longitude'),
-                timezone=geolocation_data.get('timezone'),
-                isp=geolocation_data.get('isp'),
-                geolocation_updated=timezone.now() if geolocation_data.get('source') not in ['private_ip', 'failed'] else None,
-                geolocation_source=geolocation_data.get('source'),
-            )
-        except Exception as e:
-            # Fallback: log without geolocation
-            try:
-                RequestLog.objects.create(
-                    ip_address=client_ip,
-                    path=request.path,
-                    timestamp=timezone.now(),
-                )
-            except Exception:
-                # If even basic logging fails, just continue
-                pass
+        now = request._now
+        log_fields = {
+            'ip_address': client_ip,
+            'path': request.path,
+            'timestamp': now,
+            'status_code': response.status_code,
+        }
+        # Omitted fields fall back to the model defaults (NULL), which keeps
+        # buffered rows small for requests without geolocation
+        if geolocation_data:
+            source = geolocation_data.get('source')
+            for field in GEOLOCATION_LOG_FIELDS:
+                log_fields[field] = geolocation_data.get(field)
+            log_fields['geolocation_source'] = source
+            if source not in ['private_ip', 'failed']:
+                log_fields['geolocation_updated'] = now
+        
+        # Queue the entry for a bulk insert instead of an INSERT per request
+        log_buffer.buffer_request_log(log_fields)
         
         return response
\ No newline at end of file
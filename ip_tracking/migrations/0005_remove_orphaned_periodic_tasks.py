@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.utils import timezone
+
+# Beat entries no longer declared in CELERY_BEAT_SCHEDULE. The DatabaseScheduler
+# never removes rows on its own, so stale entries would keep firing alongside
+# their replacements.
+ORPHANED_PERIODIC_TASKS = ['detect-anomalies-hourly']
+
+
+def remove_orphaned_periodic_tasks(apps, schema_editor):
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+
+    deleted, _ = PeriodicTask.objects.filter(name__in=ORPHANED_PERIODIC_TASKS).delete()
+    if deleted:
+        # Tell a running beat process to reload its schedule
+        PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0004_ratelimitlog'),
+        ('django_celery_beat', '0018_improve_crontab_helptext'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_orphaned_periodic_tasks, migrations.RunPython.noop),
+    ]
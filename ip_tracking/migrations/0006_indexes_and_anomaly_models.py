@@ -0,0 +1,94 @@
+# Generated by Django 4.2.27 on 2026-10-15 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0005_remove_orphaned_periodic_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyDetectionConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('enabled', models.BooleanField(default=True)),
+                ('threshold', models.IntegerField(default=100, help_text='Requests per hour threshold')),
+                ('time_window_hours', models.IntegerField(default=1, help_text='Time window in hours')),
+                ('sensitive_paths', models.TextField(blank=True, help_text='Comma-separated list of sensitive paths (e.g., /admin, /login)')),
+                ('check_frequency', models.BooleanField(default=True, help_text='Check request frequency')),
+                ('check_sensitive_paths', models.BooleanField(default=True, help_text='Check access to sensitive paths')),
+                ('check_error_rate', models.BooleanField(default=False, help_text='Check error response rate')),
+                ('auto_block', models.BooleanField(default=False, help_text='Automatically block IP')),
+                ('severity_level', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], default='medium', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Anomaly Detection Config',
+                'verbose_name_plural': 'Anomaly Detection Configs',
+            },
+        ),
+        migrations.CreateModel(
+            name='SuspiciousIP',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ip_address', models.GenericIPAddressField()),
+                ('reason', models.CharField(choices=[('high_frequency', 'High request frequency (>100/hr)'), ('sensitive_paths', 'Accessing sensitive paths'), ('multiple_errors', 'Multiple error responses'), ('unusual_pattern', 'Unusual access pattern'), ('brute_force', 'Possible brute force attack')], max_length=200)),
+                ('severity', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], default='medium', max_length=20)),
+                ('request_count', models.IntegerField(default=0)),
+                ('first_detected', models.DateTimeField(auto_now_add=True)),
+                ('last_detected', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('auto_blocked', models.BooleanField(default=False)),
+                ('details', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'verbose_name': 'Suspicious IP',
+                'verbose_name_plural': 'Suspicious IPs',
+                'ordering': ['-last_detected'],
+            },
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='anomaly_reason',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='is_suspicious',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='blockedip',
+            index=models.Index(fields=['expires_at'], name='ip_tracking_expires_cfb178_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['ip_address', 'timestamp'], name='ip_tracking_ip_addr_d89fd9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['is_suspicious'], name='ip_tracking_is_susp_f73562_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suspiciousip',
+            index=models.Index(fields=['ip_address', 'is_active'], name='ip_tracking_ip_addr_08d1d2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suspiciousip',
+            index=models.Index(fields=['severity'], name='ip_tracking_severit_304fcd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suspiciousip',
+            index=models.Index(fields=['is_active'], name='ip_tracking_is_acti_6f7831_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='suspiciousip',
+            unique_together={('ip_address', 'reason')},
+        ),
+    ]
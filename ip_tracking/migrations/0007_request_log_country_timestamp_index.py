@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-15 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0006_indexes_and_anomaly_models'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['country', '-timestamp'], name='req_country_ts_idx'),
+        ),
+    ]
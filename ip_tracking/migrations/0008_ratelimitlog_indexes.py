@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-15 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0007_request_log_country_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ratelimitlog',
+            index=models.Index(fields=['ip_address', 'exceeded_at'], name='ip_tracking_ip_addr_3905c0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ratelimitlog',
+            index=models.Index(fields=['exceeded_at'], name='ip_tracking_exceede_43b94b_idx'),
+        ),
+    ]
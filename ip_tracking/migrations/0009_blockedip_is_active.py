@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-15 20:38
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def deactivate_expired_blocks(apps, schema_editor):
+    BlockedIP = apps.get_model('ip_tracking', 'BlockedIP')
+    BlockedIP.objects.filter(expires_at__lte=Now()).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0008_ratelimitlog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blockedip',
+            name='is_active',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.RunPython(deactivate_expired_blocks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='blockedip',
+            index=models.Index(fields=['is_active', 'expires_at', 'ip_address'], name='blockedip_active_idx'),
+        ),
+    ]
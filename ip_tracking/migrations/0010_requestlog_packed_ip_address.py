@@ -0,0 +1,97 @@
+# Generated by Django 4.2.27 on 2026-10-15 20:52
+
+from django.db import migrations, models
+
+import ip_tracking.fields
+from ip_tracking.fields import pack_ip
+
+BATCH_SIZE = 5000
+# Stored for legacy rows whose ip_address was an unvalidated header value
+UNKNOWN_IP = '0.0.0.0'
+
+
+def packable_ip(ip_address):
+    try:
+        pack_ip(ip_address)
+    except (TypeError, ValueError):
+        return UNKNOWN_IP
+    return ip_address
+
+
+def pack_ip_addresses(apps, schema_editor):
+    RequestLog = apps.get_model('ip_tracking', 'RequestLog')
+    last_id = 0
+    while True:
+        rows = list(
+            RequestLog.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'ip_address')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        RequestLog.objects.bulk_update(
+            [RequestLog(id=log_id, ip_packed=packable_ip(ip_address)) for log_id, ip_address in rows],
+            ['ip_packed'],
+        )
+        last_id = rows[-1][0]
+
+
+def unpack_ip_addresses(apps, schema_editor):
+    RequestLog = apps.get_model('ip_tracking', 'RequestLog')
+    last_id = 0
+    while True:
+        rows = list(
+            RequestLog.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'ip_packed')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        RequestLog.objects.bulk_update(
+            [RequestLog(id=log_id, ip_address=ip_address) for log_id, ip_address in rows],
+            ['ip_address'],
+        )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0009_blockedip_is_active'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='requestlog',
+            name='ip_address',
+            field=models.GenericIPAddressField(null=True),
+        ),
+        migrations.AddField(
+            model_name='requestlog',
+            name='ip_packed',
+            field=ip_tracking.fields.PackedIPAddressField(null=True),
+        ),
+        migrations.RunPython(pack_ip_addresses, unpack_ip_addresses),
+        migrations.RemoveIndex(
+            model_name='requestlog',
+            name='ip_tracking_ip_addr_d89fd9_idx',
+        ),
+        migrations.RemoveField(
+            model_name='requestlog',
+            name='ip_address',
+        ),
+        migrations.RenameField(
+            model_name='requestlog',
+            old_name='ip_packed',
+            new_name='ip_address',
+        ),
+        migrations.AlterField(
+            model_name='requestlog',
+            name='ip_address',
+            field=ip_tracking.fields.PackedIPAddressField(),
+        ),
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['ip_address', 'timestamp'], name='ip_tracking_ip_addr_d89fd9_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.27 on 2026-10-15 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0010_requestlog_packed_ip_address'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='geolocationcache',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='geolocationcache',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='requestlog',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='requestlog',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
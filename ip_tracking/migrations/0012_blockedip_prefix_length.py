@@ -0,0 +1,26 @@
+# Generated by Django 4.2.27 on 2026-10-15 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0011_latitude_longitude_float'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='blockedip',
+            name='blockedip_active_idx',
+        ),
+        migrations.AddField(
+            model_name='blockedip',
+            name='prefix_length',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Block the whole network ip_address/prefix_length (leave empty to block only this IP)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='blockedip',
+            index=models.Index(fields=['is_active', 'expires_at', 'ip_address', 'prefix_length'], name='blockedip_active_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-15 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0012_blockedip_prefix_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestlog',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
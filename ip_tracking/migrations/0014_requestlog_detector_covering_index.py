@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-15 22:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0013_requestlog_status_code'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='requestlog',
+            name='ip_tracking_timesta_1b5975_idx',
+        ),
+        migrations.AddIndex(
+            model_name='requestlog',
+            index=models.Index(fields=['timestamp', 'ip_address', 'status_code'], name='rl_detect_covering'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-15 21:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0014_requestlog_detector_covering_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='requestlog',
+            name='isp',
+        ),
+        migrations.RemoveField(
+            model_name='requestlog',
+            name='timezone',
+        ),
+    ]
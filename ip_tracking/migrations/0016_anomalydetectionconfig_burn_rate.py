@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-15 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0015_requestlog_drop_timezone_isp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anomalydetectionconfig',
+            name='long_window_burn_rate',
+            field=models.FloatField(default=1.0, help_text='Multiple of the threshold rate required over the time window'),
+        ),
+        migrations.AddField(
+            model_name='anomalydetectionconfig',
+            name='short_window_burn_rate',
+            field=models.FloatField(default=1.0, help_text='Multiple of the threshold rate required in the short window'),
+        ),
+        migrations.AddField(
+            model_name='anomalydetectionconfig',
+            name='short_window_minutes',
+            field=models.PositiveIntegerField(default=5, help_text='Short window in minutes (0 disables the short window check)'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-15 21:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ip_tracking', '0016_anomalydetectionconfig_burn_rate'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='requestlog',
+            name='ip_tracking_country_d37b30_idx',
+        ),
+    ]
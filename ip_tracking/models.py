@@ -1,36 +1,49 @@
+import functools
+import ipaddress
+import re
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 from django.core.validators import validate_ipv46_address
 from django.contrib.auth.models import User
 from datetime import timedelta
 
+from .fields import PackedIPAddressField
+
+def format_location(city, region, country):
+    """Join city/region/country into a display string"""
+    parts = []
+    if city:
+        parts.append(city)
+    if region and region != city:
+        parts.append(region)
+    if country:
+        parts.append(country)
+    return ", ".join(parts) if parts else "Location unknown"
+
+
 class RequestLog(models.Model):
     """
     Enhanced model to store request information with geolocation data.
     """
-    ip_address = models.GenericIPAddressField()
+    # Packed bytes keep the largest table's ip_address indexes small
+    ip_address = PackedIPAddressField()
     timestamp = models.DateTimeField(default=timezone.now)
     path = models.CharField(max_length=500)
+    # Response status; NULL for rows logged before it was recorded
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
     
-    # Geolocation fields
+    # Geolocation fields; timezone and ISP are per-IP details kept only in
+    # GeolocationCache rather than repeated on every row
     country = models.CharField(max_length=100, blank=True, null=True)
     country_code = models.CharField(max_length=2, blank=True, null=True)
     city = models.CharField(max_length=100, blank=True, null=True)
     region = models.CharField(max_length=100, blank=True, null=True)
-    latitude = models.DecimalField(
-        max_digits=9, 
-        decimal_places=6, 
-        blank=True, 
-        null=True
-    )
-    longitude = models.DecimalField(
-        max_digits=9, 
-        decimal_places=6, 
-        blank=True, 
-        null=True
-    )
-    timezone = models.CharField(max_length=50, blank=True, null=True)
-    isp = models.CharField(max_length=200, blank=True, null=True)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     
     # Geolocation metadata
     geolocation_updated = models.DateTimeField(blank=True, null=True)
@@ -45,27 +58,34 @@ class RequestLog(models.Model):
         verbose_name = 'Request Log'
         verbose_name_plural = 'Request Logs'
         indexes = [
-            models.Index(fields=['country']),
+            # country alone is served by req_country_ts_idx's leading column
             models.Index(fields=['city']),
-            models.Index(fields=['timestamp', 'country']),
+            # Anomaly detector scans (time window grouped by IP, counting
+            # errors) are index-only; also serves the prune range scan
+            models.Index(fields=['timestamp', 'ip_address', 'status_code'],
+                         name='rl_detect_covering'),
             models.Index(fields=['ip_address', 'timestamp']),
             models.Index(fields=['is_suspicious']),
+            # Backfill scans: logs without geolocation, newest first
+            models.Index(fields=['country', '-timestamp'], name='req_country_ts_idx'),
         ]
     
     def __str__(self):
         location = f"{self.city}, {self.country}" if self.city and self.country else "Unknown"
         return f"{self.ip_address} - {location} - {self.path}"
     
+    @functools.cached_property
+    def location_display(self):
+        """Formatted location string, built once per instance"""
+        return format_location(self.city, self.region, self.country)
+    
     def get_location_display(self):
         """Get formatted location string"""
-        parts = []
-        if self.city:
-            parts.append(self.city)
-        if self.region and self.region != self.city:
-            parts.append(self.region)
-        if self.country:
-            parts.append(self.country)
-        return ", ".join(parts) if parts else "Location unknown"
+        return self.location_display
+    
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self.__dict__.pop('location_display', None)
 
 
 class BlockedIP(models.Model):
@@ -76,6 +96,11 @@ class BlockedIP(models.Model):
         unique=True,
         help_text="IP address to block"
     )
+    prefix_length = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="Block the whole network ip_address/prefix_length (leave empty to block only this IP)"
+    )
     reason = models.CharField(
         max_length=200,
         blank=True,
@@ -87,19 +112,45 @@ class BlockedIP(models.Model):
         blank=True,
         help_text="Optional expiration date for the block"
     )
+    # Denormalized from expires_at on save and by deactivate_expired_blocks,
+    # so the block list query can use an index
+    is_active = models.BooleanField(default=True, editable=False)
     
     class Meta:
         verbose_name = 'Blocked IP'
         verbose_name_plural = 'Blocked IPs'
         ordering = ['-created_at']
+        # ip_address is already indexed through unique=True
+        indexes = [
+            models.Index(fields=['expires_at']),
+            # Covers the active block list query (see blocklist.load_blocked_ips)
+            models.Index(fields=['is_active', 'expires_at', 'ip_address', 'prefix_length'],
+                         name='blockedip_active_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.ip_address} - {self.reason or 'No reason provided'}"
+        return f"{self.get_network_display()} - {self.reason or 'No reason provided'}"
+    
+    def get_network_display(self):
+        """Get the blocked address, in CIDR notation for networks"""
+        if self.prefix_length is None:
+            return self.ip_address
+        return f"{self.ip_address}/{self.prefix_length}"
+    
+    def clean(self):
+        if self.prefix_length is not None and self.ip_address:
+            try:
+                ipaddress.ip_network(self.get_network_display())
+            except ValueError as e:
+                raise ValidationError({'prefix_length': str(e)})
+    
+    def save(self, *args, **kwargs):
+        self.is_active = not self.is_expired()
+        super().save(*args, **kwargs)
     
     def is_expired(self):
         """Check if the block has expired"""
         if self.expires_at:
-            from django.utils import timezone
             return timezone.now() > self.expires_at
         return False
 
@@ -113,8 +164,8 @@ class GeolocationCache(models.Model):
     country_code = models.CharField(max_length=2, blank=True, null=True)
     city = models.CharField(max_length=100, blank=True, null=True)
     region = models.CharField(max_length=100, blank=True, null=True)
-    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
-    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     timezone = models.CharField(max_length=50, blank=True, null=True)
     isp = models.CharField(max_length=200, blank=True, null=True)
     
@@ -136,7 +187,6 @@ class GeolocationCache(models.Model):
     
     def is_expired(self):
         """Check if cache entry has expired"""
-        from django.utils import timezone
         return timezone.now() > self.expires_at
 
 
@@ -190,7 +240,6 @@ class SuspiciousIP(models.Model):
     
     def get_related_logs(self, hours=24):
         """Get related request logs for this IP"""
-        from .models import RequestLog
         time_threshold = timezone.now() - timedelta(hours=hours)
         return RequestLog.objects.filter(
             ip_address=self.ip_address,
@@ -222,11 +271,27 @@ class RateLimitLog(models.Model):
         verbose_name = 'Rate Limit Log'
         verbose_name_plural = 'Rate Limit Logs'
         ordering = ['-exceeded_at']
+        indexes = [
+            # Per-IP time-window lookups; also serves plain ip_address filters
+            models.Index(fields=['ip_address', 'exceeded_at']),
+            models.Index(fields=['exceeded_at']),
+        ]
     
     def __str__(self):
         return f"{self.ip_address} - {self.limit_type} - {self.exceeded_at}"
 
 
+# Bumped whenever a config changes; each process reloads the active config
+# when it sees a new version
+ANOMALY_CONFIG_VERSION_KEY = 'anomaly_config_version'
+ANOMALY_CONFIG_MAX_AGE = 60  # seconds; bounds staleness when a bump is missed
+
+
+@functools.lru_cache(maxsize=1)
+def _load_active_anomaly_config(version, period):
+    return AnomalyDetectionConfig.objects.filter(enabled=True).first()
+
+
 class AnomalyDetectionConfig(models.Model):
     """
     Configuration for anomaly detection rules.
@@ -239,6 +304,19 @@ class AnomalyDetectionConfig(models.Model):
     threshold = models.IntegerField(default=100, help_text="Requests per hour threshold")
     time_window_hours = models.IntegerField(default=1, help_text="Time window in hours")
     
+    # Multi-window burn rate: an IP is flagged for high frequency only when
+    # it exceeds its share of the threshold by these factors over both the
+    # full time window and the most recent short window
+    short_window_minutes = models.PositiveIntegerField(
+        default=5, help_text="Short window in minutes (0 disables the short window check)"
+    )
+    short_window_burn_rate = models.FloatField(
+        default=1.0, help_text="Multiple of the threshold rate required in the short window"
+    )
+    long_window_burn_rate = models.FloatField(
+        default=1.0, help_text="Multiple of the threshold rate required over the time window"
+    )
+    
     # Path patterns to monitor
     sensitive_paths = models.TextField(
         blank=True,
@@ -273,8 +351,52 @@ class AnomalyDetectionConfig(models.Model):
     def __str__(self):
         return f"{self.name} - {self.threshold} reqs/{self.time_window_hours}hr"
     
+    @classmethod
+    def get_active(cls):
+        """
+        Get the enabled configuration, or None. Cached in each process until
+        a configuration is saved or deleted (see signals.py), and for at most
+        ANOMALY_CONFIG_MAX_AGE seconds in case the bump never reaches it (the
+        LocMem fallback cache, or Redis unreachable); callers must not modify
+        the returned instance.
+        """
+        version = cache.get_or_set(ANOMALY_CONFIG_VERSION_KEY, time.time_ns, None)
+        period = int(time.monotonic() // ANOMALY_CONFIG_MAX_AGE)
+        return _load_active_anomaly_config(version, period)
+    
+    @classmethod
+    def invalidate_active(cls):
+        """Make every process reload the active configuration"""
+        cache.set(ANOMALY_CONFIG_VERSION_KEY, time.time_ns(), None)
+    
+    def get_burn_rate_thresholds(self):
+        """
+        Get the request counts an IP must exceed over the time window and
+        over the short window (None if the short window is disabled).
+        """
+        long_limit = self.threshold * self.long_window_burn_rate
+        if not self.short_window_minutes or not self.time_window_hours:
+            return long_limit, None
+        short_share = self.short_window_minutes / (self.time_window_hours * 60)
+        return long_limit, self.threshold * short_share * self.short_window_burn_rate
+    
     def get_sensitive_paths_list(self):
         """Convert comma-separated paths to list"""
         if not self.sensitive_paths:
             return []
-        return [path.strip() for path in self.sensitive_paths.split(',') if path.strip()]
\ No newline at end of file
+        return [path.strip() for path in self.sensitive_paths.split(',') if path.strip()]
+    
+    @functools.cached_property
+    def sensitive_paths_regex(self):
+        """get_sensitive_paths_regex(), computed once per instance"""
+        return self.get_sensitive_paths_regex()
+    
+    def get_sensitive_paths_regex(self):
+        """
+        Build one regex matching any sensitive path: entries starting with
+        '/' are path prefixes, others may appear anywhere in the path.
+        """
+        return '|'.join(
+            f"^{re.escape(path)}" if path.startswith('/') else re.escape(path)
+            for path in self.get_sensitive_paths_list()
+        )
\ No newline at end of file
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .blocklist import invalidate_blocked_ips
+from .models import AnomalyDetectionConfig, BlockedIP
+
+
+@receiver(post_save, sender=BlockedIP)
+@receiver(post_delete, sender=BlockedIP)
+def blocked_ip_changed(sender, **kwargs):
+    """
+    Drop the cached block list whenever a block is added, edited or removed
+    (admin, management commands, auto-blocking), so workers pick it up on
+    the next request instead of waiting for the cache TTL.
+    """
+    invalidate_blocked_ips()
+
+
+@receiver(post_save, sender=AnomalyDetectionConfig)
+@receiver(post_delete, sender=AnomalyDetectionConfig)
+def anomaly_config_changed(sender, **kwargs):
+    """
+    Make workers reload the cached active configuration after any change.
+    """
+    AnomalyDetectionConfig.invalidate_active()
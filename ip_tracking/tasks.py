@@ -1,23 +1,39 @@
-from celery import shared_task
+from celery import chord, shared_task
 from django.utils import timezone
-from django.db.models import Count, Q, F
-from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.db.models import (
+    Case, CharField, Count, ExpressionWrapper, FloatField, Max, Min, Q, F, Value, When
+)
+from django.db import connection, transaction
 from datetime import timedelta
 import logging
 from .models import (
     RequestLog, 
     SuspiciousIP, 
     BlockedIP,
-    AnomalyDetectionConfig
+    AnomalyDetectionConfig,
+    GeolocationCache
 )
+from .blocklist import BlockedIPSet, deactivate_expired_blocks, refresh_blocked_ips
+from . import log_buffer
+from .aggregates import GroupConcat
 from django.conf import settings
 from django.core.mail import send_mail
 import json
 from collections import defaultdict
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
-@shared_task
+PRUNE_BATCH_SIZE = 5000
+PRUNE_MAX_BATCHES = 100
+
+# SuspiciousIP columns rewritten when a detector flags an IP again
+SUSPICIOUS_IP_UPDATE_FIELDS = ['severity', 'request_count', 'details', 'is_active', 'last_detected']
+UPSERT_BATCH_SIZE = 1000
+DETECTOR_BATCH_SIZE = 500
+
+@shared_task(acks_late=True, time_limit=300)
 def detect_anomalies():
     """
     Hourly task to detect suspicious IP activity.
@@ -27,7 +43,7 @@ def detect_anomalies():
         logger.info("Starting anomaly detection task...")
         
         # Get active configuration
-        config = AnomalyDetectionConfig.objects.filter(enabled=True).first()
+        config = AnomalyDetectionConfig.get_active()
         if not config:
             # Create default configuration if none exists
             config = AnomalyDetectionConfig.objects.create(
@@ -42,19 +58,31 @@ def detect_anomalies():
         # Get time threshold (last hour by default)
         time_threshold = timezone.now() - timedelta(hours=config.time_window_hours)
         
-        # Detect high frequency requests
-        if config.check_frequency:
-            detect_high_frequency_ips(time_threshold, config)
-        
-        # Detect sensitive path access
-        if config.check_sensitive_paths:
-            detect_sensitive_path_access(time_threshold, config)
-        
-        # Detect error patterns
-        if config.check_error_rate:
-            detect_error_patterns(time_threshold, config)
-        
-        logger.info("Anomaly detection task completed successfully")
+        detectors = [
+            name for name, enabled in (
+                ('high_frequency', config.check_frequency),
+                ('sensitive_paths', config.check_sensitive_paths),
+                ('multiple_errors', config.check_error_rate),
+            ) if enabled
+        ]
+        if not detectors:
+            logger.info("No anomaly detectors enabled")
+            return True
+        
+        # Every detector skips the IPs blocked when this run started. Loaded
+        # once here rather than by each detector, so an IP one detector
+        # auto-blocks mid-run is still evaluated by the others instead of
+        # depending on which worker got there first
+        blocked_ips = list(BlockedIP.objects.values_list('ip_address', 'prefix_length'))
+        
+        # The detectors only read RequestLog and write rows keyed by their
+        # own reason, so they run concurrently on separate workers. Flagging
+        # request logs can touch the same rows from several detectors, so
+        # the chord callback does it serially once they have all finished
+        chord(
+            run_anomaly_detector.s(name, time_threshold.isoformat(), config.id, blocked_ips)
+            for name in detectors
+        )(finish_anomaly_detection.s(time_threshold.isoformat(), config.id))
         return True
         
     except Exception as e:
@@ -63,235 +91,462 @@ def detect_anomalies():
         return False
 
 
-def detect_high_frequency_ips(time_threshold, config):
+def detect_high_frequency_ips(time_threshold, config, blocked_ips):
     """
     Detect IPs with high request frequency.
+    Returns the (subject, message) alerts to send in the digest and the
+    {ip_address: anomaly_reason} of the request logs to flag.
     """
     logger.info(f"Detecting high frequency IPs (> {config.threshold} reqs/hour)...")
     
-    # Group logs by IP in the time window
+    # Flag only IPs over budget in both the full window and the most recent
+    # short window, so a burst that has already stopped, or a slow crawl
+    # with one busy minute, does not reach the write path
+    long_limit, short_limit = config.get_burn_rate_thresholds()
+    window_end = time_threshold + timedelta(hours=config.time_window_hours)
+    short_threshold = window_end - timedelta(minutes=config.short_window_minutes)
+    
+    # Group logs by IP in the time window, counting both windows in one scan
     ip_counts = RequestLog.objects.filter(
         timestamp__gte=time_threshold
     ).values('ip_address').annotate(
         request_count=Count('id'),
+        short_window_count=Count('id', filter=Q(timestamp__gte=short_threshold)),
         paths=Count('path', distinct=True),
-        last_request=models.Max('timestamp')
+        last_request=Max('timestamp')
     ).filter(
-        request_count__gt=config.threshold
+        request_count__gt=long_limit
     ).order_by('-request_count')
+    if short_limit is not None:
+        ip_counts = ip_counts.filter(short_window_count__gt=short_limit)
     
     suspicious_count = 0
+    alerts = []
+    log_reasons = {}
     
-    for ip_data in ip_counts:
-        ip_address = ip_data['ip_address']
-        request_count = ip_data['request_count']
-        
+    # Stream the aggregate rows and handle them a batch at a time
+    for batch in iter_batches(ip_counts):
         # Check if already blocked
-        if BlockedIP.objects.filter(ip_address=ip_address).exists():
-            continue
-        
-        # Create or update suspicious IP record
-        suspicious_ip, created = SuspiciousIP.objects.update_or_create(
-            ip_address=ip_address,
-            reason='high_frequency',
-            defaults={
-                'severity': config.severity_level,
-                'request_count': request_count,
-                'details': {
-                    'request_count': request_count,
+        flagged = [ip_data for ip_data in batch if ip_data['ip_address'] not in blocked_ips]
+        
+        # Create or update all suspicious IP records at once
+        upsert_suspicious_ips([
+            SuspiciousIP(
+                ip_address=ip_data['ip_address'],
+                reason='high_frequency',
+                severity=config.severity_level,
+                request_count=ip_data['request_count'],
+                details={
+                    'request_count': ip_data['request_count'],
+                    'short_window_requests': ip_data['short_window_count'],
                     'unique_paths': ip_data['paths'],
                     'last_request': ip_data['last_request'].isoformat() if ip_data['last_request'] else None,
                     'threshold': config.threshold,
                     'time_window': f"{config.time_window_hours} hour(s)",
                 },
-                'is_active': True,
-            }
-        )
-        
-        # Mark related logs as suspicious
-        RequestLog.objects.filter(
-            ip_address=ip_address,
-            timestamp__gte=time_threshold
-        ).update(
-            is_suspicious=True,
-            anomaly_reason=f"High frequency: {request_count} requests in {config.time_window_hours} hour(s)"
-        )
+                is_active=True,
+            )
+            for ip_data in flagged
+        ])
         
-        # Auto-block if configured
-        if config.auto_block and request_count > config.threshold * 2:
-            auto_block_ip(ip_address, 'high_frequency', suspicious_ip)
-            suspicious_ip.auto_blocked = True
-            suspicious_ip.save()
+        # Related logs are flagged by finish_anomaly_detection
+        log_reasons.update({
+            ip_data['ip_address']: f"High frequency: {ip_data['request_count']} requests in {config.time_window_hours} hour(s)"
+            for ip_data in flagged
+        })
         
-        suspicious_count += 1
+        auto_blocked = []
         
-        # Send alert for critical cases
-        if request_count > config.threshold * 5:
-            send_alert_email(
-                f"Critical: High Frequency IP Detected - {ip_address}",
-                f"IP {ip_address} made {request_count} requests in the last hour "
-                f"(threshold: {config.threshold})."
-            )
+        for ip_data in flagged:
+            ip_address = ip_data['ip_address']
+            request_count = ip_data['request_count']
+            
+            # Auto-block if configured
+            if config.auto_block and request_count > config.threshold * 2:
+                auto_blocked.append(ip_address)
+            
+            suspicious_count += 1
+            
+            # Send alert for critical cases
+            if request_count > config.threshold * 5:
+                alerts.append((
+                    f"Critical: High Frequency IP Detected - {ip_address}",
+                    f"IP {ip_address} made {request_count} requests in the last hour "
+                    f"(threshold: {config.threshold})."
+                ))
+        
+        alerts.extend(auto_block_ips(auto_blocked, 'high_frequency'))
+        mark_auto_blocked('high_frequency', auto_blocked)
     
     logger.info(f"Found {suspicious_count} IPs with high frequency")
+    return alerts, log_reasons
 
 
-def detect_sensitive_path_access(time_threshold, config):
+def detect_sensitive_path_access(time_threshold, config, blocked_ips):
     """
     Detect IPs accessing sensitive paths.
+    Returns the (subject, message) alerts to send in the digest and the
+    {ip_address: anomaly_reason} of the request logs to flag.
     """
     logger.info("Detecting sensitive path access...")
     
-    sensitive_paths = config.get_sensitive_paths_list()
-    if not sensitive_paths:
+    if not config.sensitive_paths_regex:
         logger.info("No sensitive paths configured")
-        return
-    
-    # Build query for sensitive paths
-    sensitive_path_q = Q()
-    for path in sensitive_paths:
-        if path.startswith('/'):
-            sensitive_path_q |= Q(path__startswith=path)
-        else:
-            sensitive_path_q |= Q(path__contains=path)
+        return [], {}
     
     # Find IPs accessing sensitive paths
     sensitive_access = RequestLog.objects.filter(
-        timestamp__gte=time_threshold,
-        sensitive_path_q
+        sensitive_log_filter(config),
+        timestamp__gte=time_threshold
     ).values('ip_address').annotate(
         access_count=Count('id'),
         paths=Count('path', distinct=True),
-        unique_paths_list=models.functions.GroupConcat('path', distinct=True)
+        unique_paths_list=GroupConcat('path', distinct=True)
     ).order_by('-access_count')
     
     suspicious_count = 0
+    alerts = []
+    log_reasons = {}
     
-    for ip_data in sensitive_access:
-        ip_address = ip_data['ip_address']
-        access_count = ip_data['access_count']
-        
+    # Stream the aggregate rows and handle them a batch at a time
+    for batch in iter_batches(sensitive_access):
         # Check if already blocked
-        if BlockedIP.objects.filter(ip_address=ip_address).exists():
-            continue
+        flagged = [ip_data for ip_data in batch if ip_data['ip_address'] not in blocked_ips]
         
         # Get the actual paths accessed
-        paths = getattr(ip_data, 'unique_paths_list', '').split(',')[:5]
+        paths_by_ip = {
+            ip_data['ip_address']: (ip_data['unique_paths_list'] or '').split(',', 5)[:5]
+            for ip_data in flagged
+        }
         
-        # Create or update suspicious IP record
-        suspicious_ip, created = SuspiciousIP.objects.update_or_create(
-            ip_address=ip_address,
-            reason='sensitive_paths',
-            defaults={
-                'severity': 'high' if access_count > 10 else config.severity_level,
-                'request_count': access_count,
-                'details': {
-                    'access_count': access_count,
-                    'sensitive_paths_accessed': paths,
+        # Create or update all suspicious IP records at once
+        upsert_suspicious_ips([
+            SuspiciousIP(
+                ip_address=ip_data['ip_address'],
+                reason='sensitive_paths',
+                severity='high' if ip_data['access_count'] > 10 else config.severity_level,
+                request_count=ip_data['access_count'],
+                details={
+                    'access_count': ip_data['access_count'],
+                    'sensitive_paths_accessed': paths_by_ip[ip_data['ip_address']],
                     'unique_path_count': ip_data['paths'],
                     'time_window': f"{config.time_window_hours} hour(s)",
                 },
-                'is_active': True,
-            }
-        )
-        
-        # Mark related sensitive path logs as suspicious
-        RequestLog.objects.filter(
-            ip_address=ip_address,
-            timestamp__gte=time_threshold,
-            sensitive_path_q
-        ).update(
-            is_suspicious=True,
-            anomaly_reason=f"Sensitive path access: {access_count} attempts"
-        )
+                is_active=True,
+            )
+            for ip_data in flagged
+        ])
         
-        # Auto-block if configured and accessed multiple sensitive paths
-        if config.auto_block and ip_data['paths'] > 2:
-            auto_block_ip(ip_address, 'sensitive_paths', suspicious_ip)
-            suspicious_ip.auto_blocked = True
-            suspicious_ip.save()
+        # Related sensitive path logs are flagged by finish_anomaly_detection
+        log_reasons.update({
+            ip_data['ip_address']: f"Sensitive path access: {ip_data['access_count']} attempts"
+            for ip_data in flagged
+        })
         
-        suspicious_count += 1
+        auto_blocked = []
         
-        # Send alert for multiple sensitive path access
-        if ip_data['paths'] > 3:
-            send_alert_email(
-                f"Alert: Multiple Sensitive Path Access - {ip_address}",
-                f"IP {ip_address} accessed {ip_data['paths']} different sensitive paths "
-                f"({access_count} total attempts).\n\nPaths: {', '.join(paths)}"
-            )
+        for ip_data in flagged:
+            ip_address = ip_data['ip_address']
+            access_count = ip_data['access_count']
+            paths = paths_by_ip[ip_address]
+            
+            # Auto-block if configured and accessed multiple sensitive paths
+            if config.auto_block and ip_data['paths'] > 2:
+                auto_blocked.append(ip_address)
+            
+            suspicious_count += 1
+            
+            # Send alert for multiple sensitive path access
+            if ip_data['paths'] > 3:
+                alerts.append((
+                    f"Alert: Multiple Sensitive Path Access - {ip_address}",
+                    f"IP {ip_address} accessed {ip_data['paths']} different sensitive paths "
+                    f"({access_count} total attempts).\n\nPaths: {', '.join(paths)}"
+                ))
+        
+        alerts.extend(auto_block_ips(auto_blocked, 'sensitive_paths'))
+        mark_auto_blocked('sensitive_paths', auto_blocked)
     
     logger.info(f"Found {suspicious_count} IPs accessing sensitive paths")
+    return alerts, log_reasons
 
 
-def detect_error_patterns(time_threshold, config):
+def detect_error_patterns(time_threshold, config, blocked_ips):
     """
     Detect IPs with high error rates.
+    Returns the (subject, message) alerts to send in the digest and the
+    {ip_address: anomaly_reason} of the request logs to flag.
     """
     logger.info("Detecting error patterns...")
     
     # Find IPs with high error rates (4xx and 5xx responses)
     error_ips = RequestLog.objects.filter(
         timestamp__gte=time_threshold
-    ).extra(
-        select={'status_class': "SUBSTRING(CAST(status_code AS TEXT), 1, 1)"}
-    ).filter(
-        status_class__in=['4', '5']
     ).values('ip_address').annotate(
         total_requests=Count('id'),
-        error_requests=Count('id', filter=Q(status_class__in=['4', '5'])),
-        error_rate=Count('id', filter=Q(status_class__in=['4', '5'])) * 100.0 / Count('id')
+        error_requests=Count('id', filter=Q(status_code__gte=400)),
+    ).annotate(
+        error_rate=ExpressionWrapper(
+            F('error_requests') * 100.0 / F('total_requests'),
+            output_field=FloatField()
+        )
     ).filter(
+        error_requests__gt=0,
         error_rate__gt=50.0,  # More than 50% errors
         total_requests__gt=10  # At least 10 requests
     ).order_by('-error_rate')
     
     suspicious_count = 0
+    alerts = []
+    log_reasons = {}
     
-    for ip_data in error_ips:
-        ip_address = ip_data['ip_address']
-        error_rate = ip_data['error_rate']
-        total_requests = ip_data['total_requests']
-        error_requests = ip_data['error_requests']
-        
-        # Create or update suspicious IP record
-        suspicious_ip, created = SuspiciousIP.objects.update_or_create(
-            ip_address=ip_address,
-            reason='multiple_errors',
-            defaults={
-                'severity': 'high' if error_rate > 80 else 'medium',
-                'request_count': total_requests,
-                'details': {
-                    'total_requests': total_requests,
-                    'error_requests': error_requests,
-                    'error_rate': round(error_rate, 2),
+    # Stream the aggregate rows and handle them a batch at a time
+    for batch in iter_batches(error_ips):
+        # Check if already blocked
+        flagged = [ip_data for ip_data in batch if ip_data['ip_address'] not in blocked_ips]
+        
+        # Create or update all suspicious IP records at once
+        upsert_suspicious_ips([
+            SuspiciousIP(
+                ip_address=ip_data['ip_address'],
+                reason='multiple_errors',
+                severity='high' if ip_data['error_rate'] > 80 else 'medium',
+                request_count=ip_data['total_requests'],
+                details={
+                    'total_requests': ip_data['total_requests'],
+                    'error_requests': ip_data['error_requests'],
+                    'error_rate': round(ip_data['error_rate'], 2),
                     'time_window': f"{config.time_window_hours} hour(s)",
                 },
-                'is_active': True,
-            }
+                is_active=True,
+            )
+            for ip_data in flagged
+        ])
+        
+        # Error logs are flagged by finish_anomaly_detection
+        log_reasons.update({
+            ip_data['ip_address']: f"High error rate: {round(ip_data['error_rate'], 1)}%"
+            for ip_data in flagged
+        })
+        
+        for ip_data in flagged:
+            ip_address = ip_data['ip_address']
+            error_rate = ip_data['error_rate']
+            total_requests = ip_data['total_requests']
+            error_requests = ip_data['error_requests']
+            
+            suspicious_count += 1
+            
+            # Send alert for very high error rates
+            if error_rate > 80:
+                alerts.append((
+                    f"Alert: High Error Rate - {ip_address}",
+                    f"IP {ip_address} has {error_rate:.1f}% error rate "
+                    f"({error_requests}/{total_requests} requests)."
+                ))
+    
+    logger.info(f"Found {suspicious_count} IPs with high error rates")
+    return alerts, log_reasons
+
+
+def sensitive_log_filter(config):
+    """
+    Match logs for sensitive paths: one regex instead of an OR of LIKE
+    conditions, one per path.
+    """
+    return Q(path__regex=config.sensitive_paths_regex)
+
+
+ANOMALY_DETECTORS = {
+    'high_frequency': detect_high_frequency_ips,
+    'sensitive_paths': detect_sensitive_path_access,
+    'multiple_errors': detect_error_patterns,
+}
+
+# Which of an IP's logs each detector flags. finish_anomaly_detection
+# applies them in this order, so for a log flagged by several detectors
+# the reason from the last one wins
+ANOMALY_LOG_FILTERS = {
+    'high_frequency': lambda config: Q(),
+    'sensitive_paths': sensitive_log_filter,
+    'multiple_errors': lambda config: Q(status_code__gte=400),
+}
+
+
+def get_detection_config(config_id):
+    """
+    Get the configuration detect_anomalies dispatched a run with.
+    """
+    config = AnomalyDetectionConfig.get_active()
+    if config is None or config.id != config_id:
+        # Changed since detect_anomalies dispatched this run
+        config = AnomalyDetectionConfig.objects.get(id=config_id)
+    return config
+
+
+@shared_task(acks_late=True, time_limit=300, ignore_result=False)
+def run_anomaly_detector(name, time_threshold, config_id, blocked_ips=None):
+    """
+    Run one anomaly detector (fanned out by detect_anomalies).
+    blocked_ips is the run's [ip_address, prefix_length] snapshot, shared
+    by every detector so their results don't depend on each other's
+    auto-blocks; None (messages queued before it was added) reads the
+    table. Returns {'detector': name, 'log_reasons': {ip_address: reason}}
+    for finish_anomaly_detection, or None if the detector failed.
+    """
+    try:
+        config = get_detection_config(config_id)
+        if blocked_ips is None:
+            blocked_ips = BlockedIPSet.from_queryset(BlockedIP.objects.all())
+        else:
+            blocked_ips = BlockedIPSet.from_rows(blocked_ips)
+        alerts, log_reasons = ANOMALY_DETECTORS[name](
+            parse_datetime(time_threshold), config, blocked_ips
         )
+        # One email per detector run rather than one per flagged IP
+        send_alert_digest(f"Anomaly Detection: {name}", alerts)
+        return {'detector': name, 'log_reasons': log_reasons}
         
-        # Mark error logs as suspicious
+    except Exception as e:
+        logger.error(f"Anomaly detector {name} failed: {e}")
+        send_alert_email("Anomaly Detection Task Failed", f"{name}: {e}")
+        return None
+
+
+@shared_task(acks_late=True, time_limit=300)
+def finish_anomaly_detection(results, time_threshold, config_id):
+    """
+    Chord callback for detect_anomalies; results are the detectors' return
+    values. Flags the request logs of every detector's IPs here, one
+    detector at a time, so the concurrent detectors never update the same
+    RequestLog rows and overlapping flags resolve in a fixed order.
+    """
+    config = get_detection_config(config_id)
+    time_threshold = parse_datetime(time_threshold)
+    log_reasons = {result['detector']: result['log_reasons'] for result in results if result}
+    for name, get_filter in ANOMALY_LOG_FILTERS.items():
+        if log_reasons.get(name):
+            mark_suspicious_logs(time_threshold, log_reasons[name], get_filter(config))
+    
+    failed = len(results) - len(log_reasons)
+    if not failed:
+        logger.info("Anomaly detection task completed successfully")
+    else:
+        logger.warning(f"Anomaly detection completed with {failed} failed detector(s)")
+    return not failed
+
+
+def iter_batches(queryset, batch_size=DETECTOR_BATCH_SIZE):
+    """
+    Yield a queryset's rows in lists of up to batch_size, streamed with
+    .iterator() so the full result is never held at once.
+    """
+    rows = queryset.iterator(chunk_size=batch_size)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def upsert_suspicious_ips(suspicious_ips):
+    """
+    Insert or update SuspiciousIP rows keyed on (ip_address, reason) with
+    one INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE per batch.
+    """
+    if not suspicious_ips:
+        return
+    
+    # MySQL upserts on any unique key and rejects an explicit target
+    unique_fields = (
+        ['ip_address', 'reason']
+        if connection.features.supports_update_conflicts_with_target
+        else None
+    )
+    SuspiciousIP.objects.bulk_create(
+        suspicious_ips,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=SUSPICIOUS_IP_UPDATE_FIELDS,
+        batch_size=UPSERT_BATCH_SIZE,
+    )
+
+
+def mark_suspicious_logs(time_threshold, reasons, *filters):
+    """
+    Flag the request logs of many IPs since time_threshold, given as
+    {ip_address: anomaly_reason}, with one UPDATE per batch of IPs.
+    """
+    ip_addresses = list(reasons)
+    for start in range(0, len(ip_addresses), UPSERT_BATCH_SIZE):
+        batch = ip_addresses[start:start + UPSERT_BATCH_SIZE]
         RequestLog.objects.filter(
-            ip_address=ip_address,
-            timestamp__gte=time_threshold,
-            status_code__gte=400
+            *filters,
+            ip_address__in=batch,
+            timestamp__gte=time_threshold
         ).update(
             is_suspicious=True,
-            anomaly_reason=f"High error rate: {round(error_rate, 1)}%"
-        )
-        
-        suspicious_count += 1
-        
-        # Send alert for very high error rates
-        if error_rate > 80:
-            send_alert_email(
-                f"Alert: High Error Rate - {ip_address}",
-                f"IP {ip_address} has {error_rate:.1f}% error rate "
-                f"({error_requests}/{total_requests} requests)."
+            anomaly_reason=Case(
+                *[When(ip_address=ip_address, then=Value(reasons[ip_address])) for ip_address in batch],
+                output_field=CharField(),
             )
+        )
+
+
+def mark_auto_blocked(reason, ip_addresses):
+    """
+    Flag the SuspiciousIP records of auto-blocked IPs in one UPDATE.
+    """
+    if ip_addresses:
+        SuspiciousIP.objects.filter(
+            reason=reason, ip_address__in=ip_addresses
+        ).update(auto_blocked=True)
+
+
+def auto_block_alert(ip_address, reason, expires_at):
+    """
+    Build the (subject, message) alert for an auto-blocked IP.
+    """
+    return (
+        f"IP Auto-blocked: {ip_address}",
+        f"IP {ip_address} has been automatically blocked.\n"
+        f"Reason: {reason}\n"
+        f"Expires: {expires_at.strftime('%Y-%m-%d %H:%M:%S')}"
+    )
+
+
+def auto_block_ips(ip_addresses, reason):
+    """
+    Block many IPs for 24 hours with one INSERT, skipping IPs that are
+    already blocked, then refresh the cached block list once.
+    Returns the alerts for the newly blocked IPs.
+    """
+    if not ip_addresses:
+        return []
     
-    logger.info(f"Found {suspicious_count} IPs with high error rates")
+    already_blocked = set(BlockedIP.objects.filter(
+        ip_address__in=ip_addresses
+    ).values_list('ip_address', flat=True))
+    new_ips = [ip for ip in ip_addresses if ip not in already_blocked]
+    if not new_ips:
+        return []
+    
+    expires_at = timezone.now() + timedelta(hours=24)
+    # bulk_create skips save() and post_save, so is_active is set here and
+    # the cache is refreshed explicitly below
+    BlockedIP.objects.bulk_create([
+        BlockedIP(
+            ip_address=ip,
+            reason=f"Auto-blocked: {reason}",
+            expires_at=expires_at,
+            is_active=True,
+        )
+        for ip in new_ips
+    ], ignore_conflicts=True)
+    refresh_blocked_ips()
+    
+    logger.info(f"Auto-blocked {len(new_ips)} IPs - Reason: {reason}")
+    return [auto_block_alert(ip, reason, expires_at) for ip in new_ips]
 
 
 @shared_task
@@ -307,6 +562,7 @@ def auto_block_ip(ip_address, reason, suspicious_ip_id=None):
         # Create block entry (24 hour temporary block)
         expires_at = timezone.now() + timedelta(hours=24)
         
+        # post_save invalidates the cached block list (see signals.py)
         block = BlockedIP.objects.create(
             ip_address=ip_address,
             reason=f"Auto-blocked: {reason}",
@@ -325,13 +581,7 @@ def auto_block_ip(ip_address, reason, suspicious_ip_id=None):
         logger.info(f"Auto-blocked IP: {ip_address} - Reason: {reason}")
         
         # Send alert
-        send_alert_email(
-            f"IP Auto-blocked: {ip_address}",
-            f"IP {ip_address} has been automatically blocked.\n"
-            f"Reason: {reason}\n"
-            f"Expires: {expires_at.strftime('%Y-%m-%d %H:%M:%S')}"
-        )
-        
+        send_alert_email(*auto_block_alert(ip_address, reason, expires_at))
         return True
         
     except Exception as e:
@@ -339,6 +589,113 @@ def auto_block_ip(ip_address, reason, suspicious_ip_id=None):
         return False
 
 
+@shared_task
+def sync_blocked_ip_cache():
+    """
+    Mirror the active block list into the shared cache (runs every minute).
+    """
+    try:
+        deactivate_expired_blocks()
+        blocked_ips = refresh_blocked_ips()
+        logger.info(f"Synced {len(blocked_ips)} blocked IPs to cache")
+        return len(blocked_ips)
+        
+    except Exception as e:
+        logger.error(f"Failed to sync blocked IP cache: {e}")
+        return None
+
+
+@shared_task
+def flush_request_logs():
+    """
+    Bulk insert RequestLog rows buffered by the middleware (runs every second).
+    """
+    try:
+        return log_buffer.flush_request_logs()
+        
+    except Exception as e:
+        logger.error(f"Failed to flush buffered request logs: {e}")
+        return 0
+
+
+@shared_task
+def enrich_log_geolocation(ip_address):
+    """
+    Look up geolocation for an IP and fill it in on its logs that were
+    recorded without it (queued by the middleware on a cache miss).
+    """
+    from .middleware import BasicIPLoggingMiddleware
+    
+    try:
+        data = BasicIPLoggingMiddleware(None).get_geolocation_data(ip_address)
+        if data.get('source') in ['private_ip', 'failed']:
+            return 0
+        
+        return RequestLog.objects.filter(
+            ip_address=ip_address,
+            country__isnull=True
+        ).update(
+            country=data.get('country'),
+            country_code=data.get('country_code'),
+            city=data.get('city'),
+            region=data.get('region'),
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude'),
+            geolocation_updated=timezone.now(),
+            geolocation_source=data.get('source'),
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to enrich geolocation for {ip_address}: {e}")
+        return 0
+
+
+@shared_task(acks_late=True, time_limit=300)
+def prune_request_logs():
+    """
+    Delete request logs older than REQUEST_LOG_RETENTION_DAYS (runs hourly).
+    Rows go in primary-key batches so each DELETE is a short transaction
+    instead of one long lock over the whole backlog.
+    """
+    try:
+        cutoff = timezone.now() - timedelta(days=settings.REQUEST_LOG_RETENTION_DAYS)
+        deleted = 0
+        
+        for _ in range(PRUNE_MAX_BATCHES):
+            ids = list(RequestLog.objects.filter(
+                timestamp__lt=cutoff
+            ).values_list('id', flat=True)[:PRUNE_BATCH_SIZE])
+            if not ids:
+                break
+            
+            count, _ = RequestLog.objects.filter(id__in=ids).delete()
+            deleted += count
+        
+        logger.info(f"Pruned {deleted} request logs older than {cutoff}")
+        return deleted
+        
+    except Exception as e:
+        logger.error(f"Failed to prune request logs: {e}")
+        return 0
+
+
+@shared_task
+def cleanup_geolocation_cache():
+    """
+    Delete expired GeolocationCache entries (runs nightly).
+    """
+    try:
+        deleted, _ = GeolocationCache.objects.filter(
+            expires_at__lt=timezone.now()
+        ).delete()
+        logger.info(f"Deleted {deleted} expired geolocation cache entries")
+        return deleted
+        
+    except Exception as e:
+        logger.error(f"Failed to clean up geolocation cache: {e}")
+        return 0
+
+
 @shared_task
 def clear_old_suspicious_ips():
     """
@@ -367,7 +724,7 @@ def clear_old_suspicious_ips():
         return False
 
 
-@shared_task
+@shared_task(acks_late=True, time_limit=300, ignore_result=False)
 def analyze_ip_behavior(ip_address, hours=24):
     """
     Analyze behavior of a specific IP address.
@@ -375,49 +732,47 @@ def analyze_ip_behavior(ip_address, hours=24):
     try:
         time_threshold = timezone.now() - timedelta(hours=hours)
         
-        # Get all logs for this IP
-        logs = RequestLog.objects.filter(
+        config = AnomalyDetectionConfig.get_active()
+        sensitive_paths = config.get_sensitive_paths_list() if config else []
+        
+        # All statistics in one aggregate query over this IP's logs
+        stats = RequestLog.objects.filter(
             ip_address=ip_address,
             timestamp__gte=time_threshold
-        ).order_by('timestamp')
+        ).aggregate(
+            total=Count('id'),
+            unique_paths=Count('path', distinct=True),
+            first=Min('timestamp'),
+            last=Max('timestamp'),
+            errors=Count('id', filter=Q(status_code__gte=400)),
+            sensitive=Count('id', filter=Q(path__in=sensitive_paths)),
+        )
         
-        if not logs:
+        total_requests = stats['total']
+        if not total_requests:
             return {"error": "No logs found for this IP"}
         
-        # Calculate statistics
-        total_requests = logs.count()
-        unique_paths = logs.values('path').distinct().count()
-        
         # Calculate requests per hour
         if total_requests > 1:
-            time_span = (logs.last().timestamp - logs.first().timestamp).total_seconds() / 3600
+            time_span = (stats['last'] - stats['first']).total_seconds() / 3600
             requests_per_hour = total_requests / max(time_span, 1)
         else:
             requests_per_hour = total_requests
         
-        # Calculate error rate
-        error_logs = logs.filter(status_code__gte=400)
-        error_rate = (error_logs.count() / total_requests * 100) if total_requests > 0 else 0
-        
-        # Check for sensitive path access
-        config = AnomalyDetectionConfig.objects.filter(enabled=True).first()
-        sensitive_paths = config.get_sensitive_paths_list() if config else []
-        
-        sensitive_access = logs.filter(
-            Q(path__in=sensitive_paths) if sensitive_paths else Q()
-        ).count()
+        error_rate = stats['errors'] / total_requests * 100
+        sensitive_access = stats['sensitive']
         
         # Build analysis result
         analysis = {
             'ip_address': ip_address,
             'analysis_period_hours': hours,
             'total_requests': total_requests,
-            'unique_paths': unique_paths,
+            'unique_paths': stats['unique_paths'],
             'requests_per_hour': round(requests_per_hour, 2),
             'error_rate': round(error_rate, 2),
             'sensitive_access_count': sensitive_access,
-            'first_request': logs.first().timestamp.isoformat(),
-            'last_request': logs.last().timestamp.isoformat(),
+            'first_request': stats['first'].isoformat(),
+            'last_request': stats['last'].isoformat(),
             'suspicious': False,
             'reasons': [],
         }
@@ -473,7 +828,24 @@ def send_alert_email(subject, message):
         logger.error(f"Failed to send alert email: {e}")
 
 
-@shared_task
+def send_alert_digest(subject, alerts):
+    """
+    Send a list of (subject, message) alerts as a single email.
+    """
+    if not alerts:
+        return
+    if len(alerts) == 1:
+        send_alert_email(*alerts[0])
+        return
+    
+    message = "\n\n".join(
+        f"{alert_subject}\n{'-' * len(alert_subject)}\n{alert_message}"
+        for alert_subject, alert_message in alerts
+    )
+    send_alert_email(f"{subject} ({len(alerts)} alerts)", message)
+
+
+@shared_task(acks_late=True, time_limit=300)
 def generate_daily_report():
     """
     Generate daily anomaly detection report.
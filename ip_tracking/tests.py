@@ -0,0 +1,364 @@
+import json
+import pickle
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from . import log_buffer
+from .blocklist import BlockedIPSet
+from .cache_backends import CounterLocMemCache
+from .fields import PackedIPAddressField, pack_ip, unpack_ip
+from .models import (
+    ANOMALY_CONFIG_MAX_AGE,
+    AnomalyDetectionConfig,
+    BlockedIP,
+    RequestLog,
+    _load_active_anomaly_config,
+)
+
+
+class PackedIPAddressFieldTests(SimpleTestCase):
+    """
+    Tests for the packed binary IP address field.
+    """
+
+    def test_pack_round_trip(self):
+        for ip in ('192.168.1.10', '0.0.0.0', '2001:db8::1', '::ffff:10.0.0.1'):
+            self.assertEqual(unpack_ip(pack_ip(ip)), ip)
+        self.assertEqual(len(pack_ip('10.0.0.1')), 4)
+        self.assertEqual(len(pack_ip('2001:db8::1')), 16)
+
+    def test_pack_rejects_non_ip_values(self):
+        for value in ('unknown', '', '10.0.0.1, 10.0.0.2', '300.1.1.1'):
+            with self.assertRaises(ValueError):
+                pack_ip(value)
+
+    def test_to_python(self):
+        field = PackedIPAddressField()
+        self.assertEqual(field.to_python(pack_ip('10.0.0.1')), '10.0.0.1')
+        self.assertEqual(field.to_python('2001:0db8::0001'), '2001:db8::1')
+        self.assertIsNone(field.to_python(''))
+        with self.assertRaises(ValidationError):
+            field.to_python('unknown')
+
+    def test_get_prep_value(self):
+        field = PackedIPAddressField()
+        self.assertEqual(field.get_prep_value('10.0.0.1'), b'\n\x00\x00\x01')
+        self.assertIsNone(field.get_prep_value(None))
+        with self.assertRaises(ValueError):
+            field.get_prep_value('unknown')
+
+
+class PackedIPAddressMigrationTests(TransactionTestCase):
+    """
+    Tests for migration 0010, which converts RequestLog.ip_address from
+    text to packed bytes.
+    """
+    migrate_from = [('ip_tracking', '0009_blockedip_is_active')]
+    migrate_to = [('ip_tracking', '0010_requestlog_packed_ip_address')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        # Leave the schema at the latest migration for the other tests
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_legacy_rows_are_packed(self):
+        apps = self.migrate(self.migrate_from)
+        RequestLog = apps.get_model('ip_tracking', 'RequestLog')
+        RequestLog.objects.create(ip_address='192.168.1.10', path='/ipv4')
+        RequestLog.objects.create(ip_address='2001:db8::1', path='/ipv6')
+        # The baseline middleware stored raw X-Forwarded-For values
+        RequestLog.objects.create(ip_address='unknown', path='/header')
+
+        apps = self.migrate(self.migrate_to)
+        RequestLog = apps.get_model('ip_tracking', 'RequestLog')
+        self.assertEqual(
+            dict(RequestLog.objects.values_list('path', 'ip_address')),
+            {'/ipv4': '192.168.1.10', '/ipv6': '2001:db8::1', '/header': '0.0.0.0'},
+        )
+
+        # And back again
+        apps = self.migrate(self.migrate_from)
+        RequestLog = apps.get_model('ip_tracking', 'RequestLog')
+        self.assertEqual(
+            RequestLog.objects.get(path='/ipv6').ip_address, '2001:db8::1'
+        )
+
+
+class BlockedIPSetTests(SimpleTestCase):
+    """
+    Tests for the range-based blocked IP lookup.
+    """
+
+    def test_network_edges(self):
+        blocked = BlockedIPSet(networks=['203.0.113.0/24'])
+        self.assertIn('203.0.113.0', blocked)
+        self.assertIn('203.0.113.255', blocked)
+        self.assertNotIn('203.0.112.255', blocked)
+        self.assertNotIn('203.0.114.0', blocked)
+
+    def test_single_addresses(self):
+        blocked = BlockedIPSet(ip_addresses=['10.0.0.1', '10.0.0.3'])
+        self.assertIn('10.0.0.1', blocked)
+        self.assertIn('10.0.0.3', blocked)
+        self.assertNotIn('10.0.0.2', blocked)
+        self.assertNotIn('0.0.0.0', blocked)
+        self.assertNotIn('255.255.255.255', blocked)
+
+    def test_adjacent_and_overlapping_ranges_merge(self):
+        blocked = BlockedIPSet(
+            ip_addresses=['10.0.1.0', '10.0.0.77'],
+            networks=['10.0.0.0/25', '10.0.0.128/25', '10.0.0.64/26'],
+        )
+        self.assertEqual(list(blocked.starts), [int.from_bytes(pack_ip('10.0.0.0'), 'big')])
+        self.assertEqual(list(blocked.ends), [int.from_bytes(pack_ip('10.0.1.0'), 'big')])
+        self.assertIn('10.0.0.127', blocked)
+        self.assertIn('10.0.0.128', blocked)
+        self.assertIn('10.0.1.0', blocked)
+        self.assertNotIn('10.0.1.1', blocked)
+
+    def test_ipv6(self):
+        blocked = BlockedIPSet(ip_addresses=['2001:db8::1'], networks=['2001:db8:1::/48'])
+        self.assertIn('2001:db8::1', blocked)
+        self.assertNotIn('2001:db8::2', blocked)
+        self.assertIn('2001:db8:1:ffff::1', blocked)
+        self.assertNotIn('2001:db8:2::1', blocked)
+        self.assertNotIn('10.0.0.1', blocked)
+
+    def test_invalid_values_are_not_blocked(self):
+        blocked = BlockedIPSet(networks=['0.0.0.0/0'])
+        self.assertNotIn('unknown', blocked)
+        self.assertNotIn(None, blocked)
+
+    def test_pickle_round_trip(self):
+        blocked = pickle.loads(pickle.dumps(
+            BlockedIPSet(ip_addresses=['10.0.0.1', '2001:db8::1'], networks=['192.168.0.0/16'])
+        ))
+        self.assertIn('192.168.255.255', blocked)
+        self.assertIn('2001:db8::1', blocked)
+        self.assertEqual(len(blocked), 3)
+
+
+class FakeRedisList:
+    """
+    The subset of a Redis client flush_request_logs uses, for one list.
+    """
+
+    def __init__(self):
+        self.items = []
+
+    def rpush(self, key, *values):
+        self.items.extend(value.encode() if isinstance(value, str) else value for value in values)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def lrange(self, key, start, end):
+        self.commands.append(lambda: self.client.items[start:end + 1])
+
+    def ltrim(self, key, start, end):
+        def ltrim():
+            self.client.items = self.client.items[start:]
+        self.commands.append(ltrim)
+
+    def execute(self):
+        return [command() for command in self.commands]
+
+
+class RequestLogBufferTests(TestCase):
+    """
+    Tests for moving buffered request logs into the database.
+    """
+
+    def setUp(self):
+        self.client = FakeRedisList()
+        patcher = mock.patch.object(log_buffer, '_get_redis', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def buffer(self, *rows):
+        self.client.rpush(log_buffer.REQUEST_LOG_BUFFER_KEY, *[json.dumps(row) for row in rows])
+
+    def test_flush_writes_rows(self):
+        self.buffer(
+            {'ip_address': '10.0.0.1', 'path': '/', 'timestamp': '2026-10-15T10:00:00+00:00'},
+            {'ip_address': '2001:db8::1', 'path': '/login', 'status_code': 403},
+        )
+        self.assertEqual(log_buffer.flush_request_logs(), 2)
+        self.assertEqual(self.client.items, [])
+        self.assertEqual(
+            sorted(RequestLog.objects.values_list('ip_address', 'path')),
+            [('10.0.0.1', '/'), ('2001:db8::1', '/login')],
+        )
+
+    def test_flush_pushes_rows_back_on_database_failure(self):
+        self.buffer({'ip_address': '10.0.0.1', 'path': '/a'}, {'ip_address': '10.0.0.2', 'path': '/b'})
+        with mock.patch.object(
+            RequestLog.objects, 'bulk_create', side_effect=OperationalError('gone away')
+        ):
+            with self.assertRaises(OperationalError):
+                log_buffer.flush_request_logs()
+        self.assertEqual(len(self.client.items), 2)
+        self.assertFalse(RequestLog.objects.exists())
+
+        # The next flush retries them
+        self.assertEqual(log_buffer.flush_request_logs(), 2)
+        self.assertEqual(RequestLog.objects.count(), 2)
+
+    def test_flush_drops_malformed_rows(self):
+        self.buffer(
+            {'ip_address': 'unknown', 'path': '/a'},
+            {'ip_address': '10.0.0.1', 'path': '/b', 'isp': 'dropped column'},
+        )
+        self.client.rpush(log_buffer.REQUEST_LOG_BUFFER_KEY, 'not json')
+        with self.assertLogs(log_buffer.logger, 'ERROR'):
+            self.assertEqual(log_buffer.flush_request_logs(), 1)
+        self.assertEqual(self.client.items, [])
+        self.assertEqual(list(RequestLog.objects.values_list('path', flat=True)), ['/b'])
+
+
+class CounterLocMemCacheTests(SimpleTestCase):
+    """
+    Tests for the LocMem fallback cache's unpickled counters.
+    """
+
+    def setUp(self):
+        self.cache = CounterLocMemCache('test-counters', {})
+        self.cache.clear()
+
+    def test_counters(self):
+        self.assertTrue(self.cache.add('hits', 1, 60))
+        self.assertFalse(self.cache.add('hits', 5, 60))
+        self.assertEqual(self.cache.incr('hits'), 2)
+        self.assertEqual(self.cache.incr('hits', 3), 5)
+        self.assertEqual(self.cache.get('hits'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_other_values_are_copied(self):
+        value = {'paths': ['/admin']}
+        self.cache.set('value', value, 60)
+        value['paths'].append('/login')
+        self.assertEqual(self.cache.get('value'), {'paths': ['/admin']})
+
+    def test_expiry(self):
+        self.cache.set('hits', 1, 60)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertIsNone(self.cache.get('hits'))
+            self.assertTrue(self.cache.add('hits', 1, 60))
+
+
+class BlockIPCommandTests(TestCase):
+    """
+    Tests for the block_ip management command.
+    """
+
+    def block_ip(self, *args):
+        call_command('block_ip', *args, stdout=StringIO())
+
+    def test_network(self):
+        self.block_ip('203.0.113.0/24', '--reason', 'scanner')
+        block = BlockedIP.objects.get()
+        self.assertEqual((block.ip_address, block.prefix_length), ('203.0.113.0', 24))
+        self.assertEqual(block.get_network_display(), '203.0.113.0/24')
+
+    def test_invalid_addresses(self):
+        for value in ('unknown', '203.0.113.7/24', '10.0.0.0/33'):
+            with self.assertRaises(CommandError):
+                self.block_ip(value)
+        self.assertFalse(BlockedIP.objects.exists())
+
+    def test_relative_expiry(self):
+        before = timezone.now()
+        self.block_ip('10.0.0.1', '--expires', '+7d')
+        expires_at = BlockedIP.objects.get().expires_at
+        self.assertGreaterEqual(expires_at, before + timedelta(days=7))
+        self.assertLess(expires_at, before + timedelta(days=7, minutes=1))
+
+    def test_absolute_expiry(self):
+        self.block_ip('10.0.0.1', '--expires', '2030-01-02 03:04:05')
+        expires_at = BlockedIP.objects.get().expires_at
+        self.assertEqual(expires_at, timezone.make_aware(datetime(2030, 1, 2, 3, 4, 5)))
+
+    def test_invalid_expiry(self):
+        for value in ('+7h', 'tomorrow'):
+            with self.assertRaises(CommandError):
+                self.block_ip('10.0.0.1', '--expires', value)
+
+    def test_existing_block_needs_force(self):
+        self.block_ip('10.0.0.1', '--reason', 'first')
+        with self.assertRaises(CommandError):
+            self.block_ip('10.0.0.1', '--reason', 'second')
+        self.block_ip('10.0.0.1', '--reason', 'second', '--force')
+        self.assertEqual(BlockedIP.objects.get().reason, 'second')
+
+
+class BurnRateThresholdTests(SimpleTestCase):
+    """
+    Tests for the multi-window high-frequency thresholds.
+    """
+
+    def test_thresholds(self):
+        config = AnomalyDetectionConfig(
+            threshold=120, time_window_hours=1, short_window_minutes=5,
+            short_window_burn_rate=2.0, long_window_burn_rate=1.5,
+        )
+        # 5 of 60 minutes is 10 requests of the budget, doubled
+        self.assertEqual(config.get_burn_rate_thresholds(), (180.0, 20.0))
+
+    def test_short_window_disabled(self):
+        config = AnomalyDetectionConfig(
+            threshold=100, time_window_hours=2, short_window_minutes=0,
+            long_window_burn_rate=1.0,
+        )
+        self.assertEqual(config.get_burn_rate_thresholds(), (100.0, None))
+
+    def test_zero_time_window(self):
+        config = AnomalyDetectionConfig(threshold=100, time_window_hours=0)
+        self.assertEqual(config.get_burn_rate_thresholds(), (100.0, None))
+
+
+class ActiveConfigCacheTests(TestCase):
+    """
+    Tests for the per-process cache of the active detection config.
+    """
+
+    def setUp(self):
+        _load_active_anomaly_config.cache_clear()
+        self.addCleanup(_load_active_anomaly_config.cache_clear)
+        self.config = AnomalyDetectionConfig.objects.create(name='Default', threshold=100)
+
+    def test_reloaded_on_save(self):
+        self.assertEqual(AnomalyDetectionConfig.get_active().threshold, 100)
+        self.config.threshold = 50
+        self.config.save()
+        self.assertEqual(AnomalyDetectionConfig.get_active().threshold, 50)
+
+    def test_reloaded_after_max_age_without_signal(self):
+        self.assertEqual(AnomalyDetectionConfig.get_active().threshold, 100)
+        # A bulk update sends no signal, like a bump another process missed
+        AnomalyDetectionConfig.objects.update(threshold=50)
+        self.assertEqual(AnomalyDetectionConfig.get_active().threshold, 100)
+        later = time.monotonic() + ANOMALY_CONFIG_MAX_AGE
+        with mock.patch('time.monotonic', return_value=later):
+            self.assertEqual(AnomalyDetectionConfig.get_active().threshold, 50)
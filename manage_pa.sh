@@ -14,7 +14,10 @@ python manage.py migrate
 python manage.py collectstatic --noinput
 
 # Start Celery worker (runs in background)
-nohup celery -A config worker --loglevel=info > celery.log 2>&1 &
+nohup celery -A config worker -Ofair --concurrency=4 --loglevel=info > celery.log 2>&1 &
+
+# Start the eventlet worker for IO-bound tasks (runs in background)
+nohup celery -A config worker -P eventlet -c 50 -Q io --loglevel=info > celery_io.log 2>&1 &
 
 # Start Celery beat (runs in background)
 nohup celery -A config beat --loglevel=info > celery_beat.log 2>&1 &